@@ -0,0 +1,54 @@
+"""Compare the JSON codecs from spfy.codec and the cost of each result mode
+
+For a synthetic playlist tracks page, reports decode and encode time for
+every available codec, and how long it takes to turn the response body
+into a SpotifyResult, a model, a plain dict (raw=True) or nothing at all
+(raw="bytes").
+
+    python benchmarks/bench_codecs.py [--items 100] [--repeat 200]
+"""
+
+import argparse
+import timeit
+
+from bench_models import URL, make_page
+
+from spfy.codec import CODECS
+from spfy.models import from_response
+from spfy.result import SpotifyResult
+
+
+def bench(fn, repeat):
+    return min(timeit.repeat(fn, number=repeat, repeat=3)) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    body = make_page(args.items).encode()
+    print(f"{args.items} items per page, {len(body) / 1024:.1f} KiB of JSON")
+
+    print("\ncodec     loads ms   dumps ms")
+    for name, codec in sorted(CODECS.items()):
+        data = codec.loads(body)
+        loads = bench(lambda: codec.loads(body), args.repeat)
+        dumps = bench(lambda: codec.dumpb(data), args.repeat)
+        print(f"{name:<8} {loads:9.3f} {dumps:10.3f}")
+
+    print("\nmode            ms/page")
+    for name, codec in sorted(CODECS.items()):
+        modes = (
+            ("SpotifyResult", lambda: SpotifyResult(codec.loads(body), _client=None)),
+            ("models", lambda: from_response(URL, codec.loads(body))),
+            ("raw=True", lambda: codec.loads(body)),
+            ('raw="bytes"', lambda: body),
+        )
+        for mode, fn in modes:
+            print(f"{name + ' ' + mode:<22} {bench(fn, args.repeat):8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Compare addict based SpotifyResult with the lazy models from spfy.models
+
+Decodes a synthetic playlist tracks page and reports decode + wrap time,
+the time to read a few fields from every track and the peak memory of
+keeping the wrapped page alive.
+
+    python benchmarks/bench_models.py [--items 100] [--pages 50]
+"""
+
+import argparse
+import timeit
+import tracemalloc
+
+import ujson as json
+
+from spfy.constants import API
+from spfy.models import from_response
+from spfy.result import SpotifyResult
+
+URL = API.PREFIX.value + API.PLAYLIST_TRACKS.value
+
+
+def make_item(i):
+    artist = {
+        "id": f"artist{i:016d}",
+        "name": f"Artist {i}",
+        "type": "artist",
+        "uri": f"spotify:artist:artist{i:016d}",
+        "href": f"https://api.spotify.com/v1/artists/artist{i:016d}",
+        "external_urls": {"spotify": f"https://open.spotify.com/artist/{i}"},
+    }
+    image = {"height": 640, "width": 640, "url": f"https://i.scdn.co/image/{i:040d}"}
+    return {
+        "added_at": "2019-01-01T00:00:00Z",
+        "added_by": {"id": "user", "type": "user", "uri": "spotify:user:user"},
+        "is_local": False,
+        "track": {
+            "id": f"track{i:017d}",
+            "name": f"Track {i}",
+            "type": "track",
+            "uri": f"spotify:track:track{i:017d}",
+            "duration_ms": 200_000 + i,
+            "explicit": False,
+            "popularity": i % 100,
+            "track_number": i % 12 + 1,
+            "disc_number": 1,
+            "available_markets": ["US", "GB", "DE", "FR", "RO", "SE", "NL", "ES"],
+            "external_ids": {"isrc": f"USRC{i:08d}"},
+            "external_urls": {"spotify": f"https://open.spotify.com/track/{i}"},
+            "artists": [artist, dict(artist, name=f"Featured {i}")],
+            "album": {
+                "id": f"album{i:017d}",
+                "name": f"Album {i}",
+                "type": "album",
+                "album_type": "album",
+                "release_date": "2019-01-01",
+                "artists": [artist],
+                "images": [image, dict(image, height=300, width=300)],
+                "available_markets": ["US", "GB", "DE", "FR", "RO", "SE", "NL", "ES"],
+            },
+        },
+    }
+
+
+def make_page(items):
+    return json.dumps(
+        {
+            "href": URL,
+            "items": [make_item(i) for i in range(items)],
+            "limit": items,
+            "next": None,
+            "offset": 0,
+            "previous": None,
+            "total": items,
+        }
+    )
+
+
+def addict_result(text):
+    return SpotifyResult(json.loads(text), _client=None)
+
+
+def model_result(text):
+    return from_response(URL, json.loads(text))
+
+
+def read_fields(page):
+    for item in page["items"]:
+        track = item.track
+        _ = (track.name, track.album.name, track.artists[0].name, track.duration_ms)
+
+
+def measure_memory(build, text, pages):
+    tracemalloc.start()
+    kept = [build(text) for _ in range(pages)]
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    text = make_page(args.items)
+    print(f"{args.items} items per page, {len(text) / 1024:.1f} KiB of JSON")
+    for name, build in (("addict", addict_result), ("models", model_result)):
+        decode = min(timeit.repeat(lambda: build(text), number=args.repeat, repeat=3))
+        page = build(text)
+        access = min(
+            timeit.repeat(lambda: read_fields(page), number=args.repeat, repeat=3)
+        )
+        peak = measure_memory(build, text, args.pages)
+        print(
+            f"{name:>7}: decode+wrap {decode / args.repeat * 1000:7.3f} ms/page"
+            f"  field access {access / args.repeat * 1000:7.3f} ms/page"
+            f"  peak memory {peak / args.pages / 1024:8.1f} KiB/page"
+        )
+
+
+if __name__ == "__main__":
+    main()
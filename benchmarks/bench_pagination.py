@@ -0,0 +1,119 @@
+"""Compare the peak RSS of SpotifyResult.all() with streaming iterall()
+
+Paginates a synthetic playlist through a fake async client that answers
+every page after a random latency, and reads a few fields from each item.
+Every mode runs in its own process since peak RSS only ever grows.
+
+    python benchmarks/bench_pagination.py [--items 10000] [--limit 50]
+"""
+
+import argparse
+import asyncio
+import random
+import resource
+import subprocess
+import sys
+import time
+from urllib.parse import urlencode
+
+import ujson as json
+from bench_models import URL, make_item
+
+from spfy.asynch.result import SpotifyResult
+from spfy.concurrency import ConcurrencyController
+
+MODES = ("all", "all-ordered", "iterall", "iterall-ordered")
+
+
+def make_page(total, limit, offset):
+    return {
+        "href": f"{URL}?{urlencode({'limit': limit, 'offset': offset})}",
+        "items": [make_item(i) for i in range(offset, min(offset + limit, total))],
+        "limit": limit,
+        "next": f"{URL}?offset={offset + limit}" if offset + limit < total else None,
+        "offset": offset,
+        "previous": None,
+        "total": total,
+    }
+
+
+class FakeClient:
+    def __init__(self, total, latency):
+        self.total = total
+        self.latency = latency
+        self.concurrency = ConcurrencyController(cooldown=0)
+
+    async def _get(self, url, raw=False, limit=50, offset=0, **_params):
+        await asyncio.sleep(random.uniform(0, self.latency))
+        # Decode from JSON like the real client so every page is a fresh object
+        page = json.loads(json.dumps(make_page(self.total, limit, offset)))
+        return page if raw else SpotifyResult(page, _client=self)
+
+
+def read_fields(item):
+    track = item["track"]
+    return (track["name"], track["album"]["name"], track["artists"][0]["name"])
+
+
+async def paginate(mode, items, limit, latency):
+    client = FakeClient(items, latency)
+    first = SpotifyResult(make_page(items, limit, 0), _client=client)
+    ordered = mode.endswith("-ordered")
+    count = 0
+    if mode.startswith("all"):
+        for item in await first.all(limit, ordered=ordered):
+            read_fields(item)
+            count += 1
+    else:
+        async for item in first.iterall(limit, ordered=ordered):
+            read_fields(item)
+            count += 1
+    return count
+
+
+def run(mode, items, limit, latency):
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    count = asyncio.run(paginate(mode, items, limit, latency))
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"count": count, "seconds": elapsed, "rss": peak - baseline}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--mode", choices=MODES)
+    args = parser.parse_args()
+
+    if args.mode:
+        run(args.mode, args.items, args.limit, args.latency)
+        return
+
+    print(f"{args.items} items in pages of {args.limit}")
+    for mode in MODES:
+        output = subprocess.run(
+            [
+                sys.executable,
+                __file__,
+                f"--mode={mode}",
+                f"--items={args.items}",
+                f"--limit={args.limit}",
+                f"--latency={args.latency}",
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        result = json.loads(output.splitlines()[-1])
+        # ru_maxrss is in KiB on Linux
+        print(
+            f"{mode:>16}: {result['count']} items in {result['seconds']:6.2f} s"
+            f"  peak RSS +{result['rss'] / 1024:7.1f} MiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
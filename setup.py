@@ -21,7 +21,6 @@ REQUIRES = [
     "async_generator",
     "asyncpg",
     "backoff",
-    "cachecontrol",
     "cached_property",
     "colorthief",
     "fire",
@@ -29,7 +28,6 @@ REQUIRES = [
     "gunicorn",
     "hug",
     "kick>=1.1.0",
-    "lockfile",
     "mailer",
     "msgpack",
     "oauthlib",
@@ -83,6 +81,7 @@ setup(
         "console_scripts": [
             "spotify = spfy.wrapper:main",
             "spotify_async = spfy.asynch.wrapper:main",
+            "spotify_replay = spfy.replay.server:main",
         ]
     },
 )
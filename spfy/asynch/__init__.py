@@ -2,7 +2,10 @@ from .. import *  # isort:skip
 
 # pylint: disable=wrong-import-order
 import asyncio
-from itertools import islice
+from collections import deque
+from itertools import count, islice
+
+from ..concurrency import ConcurrencyController
 
 
 class LimitedAsCompletedError(Exception):
@@ -19,43 +22,96 @@ def should_ignore_exception(exc, ignore_exceptions):
     )
 
 
-async def limited_as_completed(coros, limit, ignore_exceptions=False):
+# pylint: disable=too-many-locals
+async def limited_as_completed(
+    coros, limit, ignore_exceptions=False, ordered=False, max_pending=None
+):
     """
     Run the coroutines (or futures) supplied in the
     iterable coros, ensuring that there are at most
-    limit coroutines running at any time.
-    Return an iterator whose values, when waited for,
-    are Future instances containing the results of
-    the coroutines.
-    Results may be provided in any order, as they
-    become available.
+    limit coroutines running or waiting to be consumed
+    at any time. The iterable is only advanced when
+    there is room for another coroutine.
+    Yield the results of the coroutines as they
+    become available, or in input order if ordered
+    is True.
+    The limit can also be a ConcurrencyController, in which
+    case its current limit is followed as it changes and
+    every coroutine runs in one of its in-flight slots,
+    shared with the other fan-outs using the controller.
+    max_pending caps the limit, e.g. to bound the memory
+    used by results waiting for an earlier one when ordered.
+    On an exception that is not ignored, the coroutines
+    still running are cancelled and returned in the
+    raised LimitedAsCompletedError.
     """
-    futures = [asyncio.ensure_future(c) for c in islice(coros, 0, limit)]
-
-    async def first_to_finish(ignore_exceptions=False):
-        while True:
-            await asyncio.sleep(0)
-            for f in futures:
-                if f.done():
-                    futures.remove(f)
-                    try:
-                        newf = next(coros)
-                        futures.append(asyncio.ensure_future(newf))
-                    except StopIteration:
-                        pass
-                    try:
-                        return f.result()
-                    except Exception as exc:
-                        if should_ignore_exception(exc, ignore_exceptions):
-                            logger.warning("Ignoring exception:")
-                            logger.exception(exc)
-                            return None
-                        raise LimitedAsCompletedError(
-                            *exc.args, original_exc=exc, remaining_futures=futures
-                        ) from exc
-
-    while futures:
-        yield await first_to_finish(ignore_exceptions=ignore_exceptions)
+    coros = iter(coros)
+    controller = limit if isinstance(limit, ConcurrencyController) else None
+    indexes = count()
+    positions = {}
+    pending = set()
+    # Finished futures that were not yielded yet, by position if ordered
+    ready = {} if ordered else deque()
+    next_position = 0
+
+    def current_limit():
+        current = controller.limit if controller else limit
+        return min(current, max_pending) if max_pending else current
+
+    def fill():
+        free = current_limit() - len(pending) - len(ready)
+        for coro in islice(coros, 0, max(free, 0)):
+            future = asyncio.ensure_future(controller.run(coro) if controller else coro)
+            positions[future] = next(indexes)
+            pending.add(future)
+
+    def next_ready():
+        nonlocal next_position
+        if not ordered:
+            return ready.popleft() if ready else None
+
+        f = ready.pop(next_position, None)
+        if f is not None:
+            next_position += 1
+        return f
+
+    def result(f):
+        positions.pop(f)
+        try:
+            return f.result()
+        except Exception as exc:
+            if should_ignore_exception(exc, ignore_exceptions):
+                logger.warning("Ignoring exception:")
+                logger.exception(exc)
+                return None
+            remaining = [*pending, *(ready.values() if ordered else ready)]
+            for future in pending:
+                future.cancel()
+            raise LimitedAsCompletedError(
+                *exc.args, original_exc=exc, remaining_futures=remaining
+            ) from exc
+
+    try:
+        fill()
+        while pending or ready:
+            f = next_ready()
+            if f is None:
+                done, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for f in sorted(done, key=positions.get):
+                    pending.discard(f)
+                    if ordered:
+                        ready[positions[f]] = f
+                    else:
+                        ready.append(f)
+                continue
+
+            yield result(f)
+            fill()
+    finally:
+        for f in pending:
+            f.cancel()
 
 
 from .client import SpotifyClient  # isort:skip
@@ -3,10 +3,11 @@
 import asyncio
 import logging
 import signal
-from datetime import datetime
+import time
+from collections import namedtuple
+from copy import deepcopy
 from functools import partialmethod
 from hashlib import sha1
-from itertools import chain
 from operator import attrgetter
 
 import aioredis
@@ -28,8 +29,24 @@ from tenacity import (
     wait_random_exponential,
 )
 
-from .. import config, logger
-from ..cache import AudioFeatures, Playlist, async_lru, db_session, select
+from .. import config, logger, stats, trace
+from ..codec import codec
+from ..cache import (
+    AudioFeatures,
+    MemoryCache,
+    Playlist,
+    api_call_counter,
+    async_lru,
+    cache_policy,
+    compress,
+    compression_stats,
+    db,
+    db_session,
+    decompress,
+    get_device_registry,
+    select,
+)
+from ..concurrency import get_concurrency_controller
 from ..constants import (
     API,
     DEVICE_ID_RE,
@@ -44,18 +61,44 @@ from ..exceptions import (
     SpotifyDeviceUnavailableException,
     SpotifyException,
     SpotifyForbiddenException,
+    SpotifyNotFoundException,
     SpotifyRateLimitException,
 )
 from ..mixins import EmailMixin
 from ..mixins.asynch import AuthMixin
 from ..mixins.asynch.aiohttp_oauthlib import TokenUpdated
+from ..mixins.asynch.connector import release_connector
+from ..models import Model, from_response
+from ..ratelimit import get_max_retries, get_rate_limiter
 from .result import SpotifyResult
+from .singleflight import SingleFlight
+
+CachedResponse = namedtuple("CachedResponse", ["etag", "results", "fetched_at", "size"])
+NOT_FOUND = CachedResponse(None, None, 0, 0)
 
 
 def is_retryable(exc):
     if isinstance(exc, ClientResponseError) and exc.status == 429:
         return False
-    return isinstance(exc, (ClientError, ClientConnectionError, TokenUpdated))
+    return isinstance(
+        exc,
+        (ClientError, ClientConnectionError, TokenUpdated, SpotifyRateLimitException),
+    )
+
+
+wait_exponential = wait_random_exponential(multiplier=1, max=10)
+
+
+def wait_for_retry(retry_state):
+    exc = retry_state.outcome.exception()
+    if (
+        isinstance(exc, SpotifyRateLimitException)
+        and exc.http_status_code == 429
+        and exc.retry_after is not None
+    ):
+        # The shared rate limiter holds back the retry until Retry-After passes
+        return 0
+    return wait_exponential(retry_state)
 
 
 async def init_db_connection(conn):
@@ -67,7 +110,10 @@ async def init_db_connection(conn):
     )
 
 
+# pylint: disable=too-many-instance-attributes
 class SpotifyClient(AuthMixin, EmailMixin):
+    result_class = SpotifyResult
+
     def __init__(
         self,
         *args,
@@ -75,6 +121,11 @@ class SpotifyClient(AuthMixin, EmailMixin):
         requests_timeout=None,
         redis=None,
         dbpool=None,
+        models=False,
+        memory_cache=None,
+        api_prefix=None,
+        recorder=None,
+        concurrency=None,
         **kwargs,
     ):
         """
@@ -82,22 +133,78 @@ class SpotifyClient(AuthMixin, EmailMixin):
 
         :param proxy: Definition of proxy
         :param requests_timeout: Tell Requests to stop waiting for a response after a given number of seconds
-        """
+        :param models: Return lightweight models from spfy.models instead of SpotifyResult
+        :param memory_cache: In-process cache of decoded responses kept in front of Redis
+        :param api_prefix: Base URL of the API, e.g. a local spfy.replay.FakeSpotify.
+                           Tokens are then requested from {api_prefix}/api/token
+        :param recorder: spfy.replay.Cassette that records every API call
+        :param concurrency: spfy.concurrency.ConcurrencyController for fan-outs, shared per client_id by default
+        """
+        api_prefix = api_prefix or config.http.api_prefix or API.PREFIX.value
+        if api_prefix != API.PREFIX.value:
+            # Fake APIs like spfy.replay.FakeSpotify serve the token endpoint too
+            kwargs.setdefault("token_url", f"{api_prefix}/api/token")
         super().__init__(*args, **kwargs)
         self.proxy = proxy
         self.requests_timeout = requests_timeout
         self.redis = redis
         self._dbpool = dbpool
+        self.models = models
+        if memory_cache is None and config.cache.memory.enabled:
+            memory_cache = MemoryCache()
+        self.memory_cache = memory_cache
+        self.api_prefix = api_prefix
+        self.recorder = recorder
+        self.concurrency = concurrency or get_concurrency_controller(self.client_id)
+        self.rate_limiter = get_rate_limiter(self.client_id)
+        self.single_flight = SingleFlight()
+        self._revalidating = set()
+        self._revalidations = set()
+        self._user_market = None
+
+    def _make_result(self, url, results, raw=False):
+        if raw == "bytes":
+            return codec.dumpb(results)
+        if raw:
+            return results
+        if self.models:
+            return from_response(url, results, self)
+        return self.result_class(results, _client=self)
 
-    @db_session
     def _increment_api_call_count(self):
-        try:
-            user = self.user
-        except Exception:
-            logger.warning("Tried to use an inexistent user: %s", self.user_id)
-        else:
-            user.api_calls += 1
-            user.last_usage_at = datetime.utcnow()
+        api_call_counter.increment(self.user_id)
+
+    @property
+    def pending_api_calls(self):
+        """API calls made by this user that are not yet written to the database"""
+        return api_call_counter.pending(self.user_id)
+
+    def cache_stats(self, filename=None):
+        """Counters of every cache used by the client
+
+        Endpoint counters are collected per process from finished API calls,
+        only when ``cache.stats.enabled`` is set or after
+        ``trace.add_sink(stats.cache_stats)``, since they need tracing.
+        If ``filename`` is given the stats are also written there as JSON.
+        """
+        cache_stats = {
+            "endpoints": stats.cache_stats.to_dict(),
+            "memory": (
+                self.memory_cache.stats() if self.memory_cache is not None else None
+            ),
+            "compression": compression_stats.to_dict(),
+            "single_flight": self.single_flight.stats(),
+            "async_lru": {
+                # pylint: disable=no-member
+                "artist_related_artists": (
+                    SpotifyClient.artist_related_artists.cache_info()
+                )
+            },
+            "queries": stats.query_stats(db),
+        }
+        if filename:
+            stats.export(cache_stats, filename)
+        return cache_stats
 
     async def _check_response(self, response):
         try:
@@ -107,13 +214,16 @@ class SpotifyClient(AuthMixin, EmailMixin):
             if response.status == 429 or (
                 response.status >= 500 and response.status < 600
             ):
+                retry_after = response.headers.get("Retry-After")
                 raise SpotifyRateLimitException(
-                    retry_after=int(response.headers.get("Retry-After", 0)),
+                    retry_after=int(retry_after) if retry_after is not None else None,
                     **exception_params,
                 ) from exc
 
             if response.status == 403:
                 raise SpotifyForbiddenException(**exception_params) from exc
+            if response.status == 404:
+                raise SpotifyNotFoundException(**exception_params) from exc
             raise SpotifyException(**exception_params) from exc
 
     @property
@@ -148,6 +258,12 @@ class SpotifyClient(AuthMixin, EmailMixin):
             )
 
     async def release_resources(self):
+        api_call_counter.flush()
+        if self._revalidations:
+            for task in self._revalidations:
+                task.cancel()
+            await asyncio.gather(*self._revalidations, return_exceptions=True)
+
         if self._dbpool:
             await self._dbpool.close()
 
@@ -159,6 +275,7 @@ class SpotifyClient(AuthMixin, EmailMixin):
                 pass
         if self.session:
             await self.session.close()
+        await release_connector(self)
 
     @staticmethod
     def _get_cache_key(url, params, payload):
@@ -171,61 +288,257 @@ class SpotifyClient(AuthMixin, EmailMixin):
             cache_key.update(payload)
         return cache_key.hexdigest()
 
-    async def _fetch_response_from_cache(
-        self, method, url, payload, params, headers, cache_key
-    ):
-        etag_key = f"{cache_key}:{config.cache.key.etag}"
-        response_key = f"{cache_key}:{config.cache.key.response}"
-        logger.info("Cache hit: %s", etag_key)
-        response = await self.redis.get(response_key)
-        tr = self.redis.multi_exec()
+    @staticmethod
+    def _get_not_found_key(cache_key):
+        return f"{config.cache.key.not_found}:{cache_key}"
+
+    async def _get_cached_response(self, cache_key, expire=None, negative=False):
+        """Read the cached ETag, response and fetch time and refresh the expiry
+
+        The in-process memory cache is checked first. In Redis all three are
+        kept in one hash so that a lookup is a single pipelined HGETALL +
+        EXPIRE round trip, and the decoded response is kept in memory. With
+        ``negative``, a remembered 404 is looked up in the same round trip.
+        It is kept under its own key so that its expiry is never refreshed.
+        """
+        if self.memory_cache is not None:
+            cached = self.memory_cache.get(cache_key)
+            if cached:
+                return cached
+
+        tr = self.redis.pipeline()
+        not_found = tr.exists(self._get_not_found_key(cache_key)) if negative else None
+        fields = tr.hgetall(cache_key)
+        tr.expire(cache_key, expire or config.cache.expire)
+        await tr.execute(return_exceptions=False)
+
+        if not_found is not None and not_found.result():
+            return NOT_FOUND
+
+        fields = fields.result()
+
+        response = fields.get(config.cache.key.response.encode())
+        if not response:
+            return None
+
         try:
-            results = msgpack.loads(response, encoding="utf-8")
+            response = decompress(response)
+            results = msgpack.loads(response, raw=False)
         except:
             results = None
         if not results:
-            logger.error("Cached response is invalid: %s", etag_key)
-            tr.delete(etag_key)
-            tr.delete(response_key)
-            await tr.execute(return_exceptions=False)
-            return await self._internal_call(method, url, payload, params, headers)
-
-        tr.expire(etag_key, config.cache.expire)
-        tr.expire(response_key, config.cache.expire)
-        await tr.execute(return_exceptions=False)
-        return SpotifyResult(results, _client=self)
-
-    async def _cache_response(self, etag, results, cache_key):
-        if not etag:
+            logger.error("Cached response is invalid: %s", cache_key)
+            await self.redis.delete(cache_key)
+            return None
+
+        etag = fields.get(config.cache.key.etag.encode())
+        fetched_at = fields.get(config.cache.key.fetched_at.encode())
+        cached = CachedResponse(
+            etag.decode(config.cache.encoding) if etag else None,
+            results,
+            float(fetched_at or 0),
+            len(response),
+        )
+        if self.memory_cache is not None:
+            self.memory_cache.set(cache_key, cached, cached.size)
+        return cached
+
+    def _fetch_response_from_cache(self, url, cache_key, cached, raw=False):
+        logger.info("Cache hit: %s", cache_key)
+        results = cached.results
+        if raw is True or (not raw and self.models):
+            # These hand out the decoded response itself, which is shared with
+            # the memory cache. Unpacking a copy is cheaper than deepcopy.
+            results = msgpack.loads(msgpack.dumps(results), raw=False)
+
+        return self._make_result(url, results, raw)
+
+    async def _cache_response(self, etag, results, cache_key, policy=None):
+        if not (etag or (policy and policy.ttl)):
             return
 
         logger.debug("ETAG: %s", etag)
-        etag_key = f"{cache_key}:{config.cache.key.etag}"
-        response_key = f"{cache_key}:{config.cache.key.response}"
+        if self.memory_cache is not None:
+            self.memory_cache.invalidate(cache_key)
+        response = compress(msgpack.dumps(results))
+        trace.annotate(stored=len(response))
+        tr = self.redis.multi_exec()
+        tr.delete(self._get_not_found_key(cache_key))
+        tr.hmset_dict(
+            cache_key,
+            {
+                config.cache.key.etag: etag or "",
+                config.cache.key.response: response,
+                config.cache.key.fetched_at: time.time(),
+            },
+        )
+        tr.expire(cache_key, policy.expire if policy else config.cache.expire)
+        await tr.execute(return_exceptions=False)
+
+    async def _cache_not_found(self, cache_key):
+        """Remember a 404 for a while so that the request is not repeated"""
+        if self.memory_cache is not None:
+            self.memory_cache.invalidate(cache_key)
         tr = self.redis.multi_exec()
-        tr.setex(etag_key, config.cache.expire, etag)
-        tr.setex(
-            response_key,
-            config.cache.expire,
-            msgpack.dumps(results),
+        tr.delete(cache_key)
+        tr.set(
+            self._get_not_found_key(cache_key),
+            time.time(),
+            expire=config.cache.negative.expire or 3600,
         )
         await tr.execute(return_exceptions=False)
 
-    async def _get_cache_header(self, cache_key):
-        etag_key = f"{cache_key}:{config.cache.key.etag}"
-        etag = await self.redis.get(etag_key, encoding=config.cache.encoding)
-        if etag:
-            return {"If-None-Match": etag}
+    @staticmethod
+    def _get_entity_key(entity_type, _id, market=None):
+        prefix = config.cache.entities.prefix or "entity"
+        if market:
+            return f"{prefix}:{entity_type}:{market}:{_id}"
+        return f"{prefix}:{entity_type}:{_id}"
+
+    async def _get_user_market(self):
+        """Country of the current user, which market="from_token" stands for
+
+        Empty when there is no user to ask for it, like with client
+        credentials, or when /me fails. A 403 is remembered since it won't go
+        away without more scopes, other errors are retried on the next call.
+        """
+        if self.flow == AuthFlow.CLIENT_CREDENTIALS or not self.user_id:
+            return ""
+        if self._user_market is None:
+            try:
+                self._user_market = (await self.me()).country or ""
+            except SpotifyForbiddenException:
+                logger.warning("Can't get the user's market, /me is forbidden")
+                self._user_market = ""
+            except SpotifyException as exc:
+                logger.warning("Can't get the user's market: %s", exc)
+                return ""
+        return self._user_market
+
+    # pylint: disable=too-many-locals,too-many-branches
+    async def _get_entities(
+        self, url, key, entity_type, ids, batch_size, market=None, wrap=False, **kwargs
+    ):
+        """GET ``url`` for ``ids`` in batches, reusing the entities cached in Redis
+
+        Every entity is cached on its own under ``entity:{type}:{id}`` so that
+        calls with overlapping ids share cache entries. Only the ids missing
+        from Redis are requested, and the entities are returned as a list in
+        the order of ``ids``, with None for ids that don't exist. Those are
+        cached too, for a shorter time, so they are not requested every time.
+        With ``wrap`` the list is returned under ``key`` in a result instead.
+
+        market="from_token" is resolved to the user's country so that
+        entities of different markets don't share a key. When it can't be
+        resolved, it is sent as is and the entity cache is skipped. The batch
+        responses themselves are not cached since the entities already are.
+        """
+        await self.ensure_redis_pool()
+        raw = kwargs.pop("raw", False)
+        cache = config.cache.entities.enabled
+        if market == "from_token":
+            user_market = await self._get_user_market()
+            if user_market:
+                market = user_market
+            else:
+                cache = False
+        if market:
+            kwargs["market"] = market
+
+        unique_ids = list(dict.fromkeys(ids))
+        entities = {}
+        if cache and unique_ids:
+            keys = [self._get_entity_key(entity_type, i, market) for i in unique_ids]
+            for _id, value in zip(unique_ids, await self.redis.mget(*keys)):
+                if not value:
+                    continue
+                try:
+                    entities[_id] = msgpack.loads(decompress(value), raw=False)
+                except:
+                    logger.error("Cached entity is invalid: %s:%s", entity_type, _id)
+
+        missing = [i for i in unique_ids if i not in entities]
+        batches = [
+            missing[i : i + batch_size] for i in range(0, len(missing), batch_size)
+        ]
+        results = await asyncio.gather(
+            *[
+                self.concurrency.run(
+                    self._get(url, ids=",".join(b), raw=True, cache=False, **kwargs)
+                )
+                for b in batches
+            ]
+        )
+
+        fetched = {}
+        for batch, result in zip(batches, results):
+            # Match by position, relinked tracks come back with a different id
+            fetched.update(zip(batch, (result or {}).get(key) or []))
+        entities.update(fetched)
+
+        if cache and fetched:
+            tr = self.redis.pipeline()
+            for _id, entity in fetched.items():
+                tr.set(
+                    self._get_entity_key(entity_type, _id, market),
+                    compress(msgpack.dumps(entity)),
+                    expire=(
+                        config.cache.entities.expire or config.cache.expire
+                        if entity
+                        else config.cache.negative.expire or 3600
+                    ),
+                )
+            await tr.execute(return_exceptions=False)
+
+        items = [entities.get(i) for i in ids]
+        if wrap:
+            return self._make_result(url, {key: items}, raw)
+        if raw == "bytes":
+            return codec.dumpb(items)
+        if raw:
+            return items
+        return list(self._make_result(url, {key: items})[key])
+
+    def _revalidate_in_background(
+        self, method, url, payload, params, headers, cache_key, increment_api_calls
+    ):
+        """Refresh a stale cached response without making the caller wait"""
+        if cache_key in self._revalidating:
+            return
+        self._revalidating.add(cache_key)
+
+        async def revalidate():
+            # Don't report the background request on the caller's span
+            trace.CURRENT_SPAN.set(None)
+            await self._request(
+                method,
+                url,
+                payload,
+                params,
+                headers,
+                increment_api_calls=increment_api_calls,
+                raw=True,
+                revalidate=True,
+            )
+
+        def done(task):
+            self._revalidating.discard(cache_key)
+            if not task.cancelled() and task.exception():
+                logger.warning("Could not revalidate %s: %s", url, task.exception())
 
-        return {}
+        task = asyncio.ensure_future(revalidate())
+        # The loop only keeps weak references to tasks
+        self._revalidations.add(task)
+        task.add_done_callback(self._revalidations.discard)
+        task.add_done_callback(done)
 
-    async def _get_request_args(self, payload, params, headers, etag_key):
+    def _get_request_args(self, payload, params, headers, etag=None):
         return {
             "proxy": self.proxy,
             "timeout": self.requests_timeout,
             "headers": {
                 "Content-Type": "application/json",
-                **(await self._get_cache_header(etag_key)),
+                **({"If-None-Match": etag} if etag else {}),
                 **(headers or {}),
             },
             "data": payload,
@@ -248,15 +561,16 @@ class SpotifyClient(AuthMixin, EmailMixin):
             "text": text,
         }
 
-    # pylint: disable=too-many-locals
+    # pylint: disable=too-many-locals,too-many-branches,too-many-statements
     @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_random_exponential(multiplier=1, max=10),
+        stop=stop_after_attempt(get_max_retries() + 1),
+        wait=wait_for_retry,
         retry=retry_if_exception(is_retryable),
         reraise=True,
         after=after_log(logger, logging.INFO),
+        before_sleep=trace.record_retry,
     )
-    async def _internal_call(
+    async def _request(
         self,
         method,
         url,
@@ -266,63 +580,201 @@ class SpotifyClient(AuthMixin, EmailMixin):
         retries=5,
         check_202=False,
         increment_api_calls=False,
+        raw=False,
+        revalidate=False,
+        cache=True,
     ):
         await self.ensure_redis_pool()
         if payload and not isinstance(payload, (bytes, str)):
-            payload = json.dumps(payload)
+            payload = codec.dumps(payload)
         params = {k: v for k, v in params.items() if v is not None}
         cache_key = self._get_cache_key(url, params, payload)
         logger.debug("Cache key: %s", cache_key)
-        request_args = await self._get_request_args(payload, params, headers, cache_key)
-        logger.debug("Request args: %s", json.dumps(request_args, indent=4))
+        policy = cache_policy(url) if method == "GET" and cache else None
+        cached = None
+        if policy and policy.cache:
+            cached = await self._get_cached_response(
+                cache_key, policy.expire, policy.negative
+            )
+        if cached is NOT_FOUND:
+            trace.annotate(status=404, cache="negative")
+            raise SpotifyNotFoundException(status_code=404, url=url)
+        if cached and not revalidate:
+            state = policy.state(time.time() - cached.fetched_at)
+            if state != "expired":
+                trace.annotate(cache=state)
+                if state == "stale":
+                    self._revalidate_in_background(
+                        method,
+                        url,
+                        payload,
+                        params,
+                        headers,
+                        cache_key,
+                        increment_api_calls,
+                    )
+                return self._fetch_response_from_cache(url, cache_key, cached, raw)
 
-        try:
-            req = await self.session._request(method, url, **request_args)
-        except TokenExpiredError as e:
-            if self.flow != AuthFlow.CLIENT_CREDENTIALS:
-                raise e
-            with db_session:
-                self.user.token = None
-            await self.authenticate(flow=AuthFlow.CLIENT_CREDENTIALS)
-            req = await self.session._request(method, url, **request_args)
-
-        async with req as resp:
-            if self.user_id and increment_api_calls:
-                self._increment_api_call_count()
-            if resp.status == 304:
-                return await self._fetch_response_from_cache(
-                    method, url, payload, params, headers, cache_key
+        request_args = self._get_request_args(
+            payload, params, headers, cached.etag if cached else None
+        )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Request args: %s",
+                json.dumps({**request_args, "client_secret": None}, indent=4),
+            )
+
+        while True:
+            await self.rate_limiter.wait()
+            try:
+                req = await self.session._request(method, url, **request_args)
+            except TokenExpiredError as e:
+                if self.flow != AuthFlow.CLIENT_CREDENTIALS:
+                    raise e
+                with db_session:
+                    self.user.token = None
+                await self.authenticate(flow=AuthFlow.CLIENT_CREDENTIALS)
+                req = await self.session._request(method, url, **request_args)
+
+            async with req as resp:
+                if self.recorder is not None:
+                    self.recorder.record(
+                        method,
+                        url,
+                        params,
+                        resp.status,
+                        resp.headers,
+                        await resp.read(),
+                        cached.etag if cached else None,
+                    )
+                trace.annotate(
+                    status=resp.status,
+                    bytes=resp.content_length,
+                    cache=(
+                        ("hit" if resp.status == 304 else "miss")
+                        if method == "GET"
+                        else None
+                    ),
                 )
+                if self.user_id and increment_api_calls:
+                    self._increment_api_call_count()
+                if cached and resp.status == 304:
+                    if policy.ttl:
+                        cached = cached._replace(fetched_at=time.time())
+                        await self.redis.hset(
+                            cache_key, config.cache.key.fetched_at, cached.fetched_at
+                        )
+                        if self.memory_cache is not None:
+                            self.memory_cache.set(cache_key, cached, cached.size)
+                    return self._fetch_response_from_cache(url, cache_key, cached, raw)
+
+                if check_202 and resp.status == 202:
+                    if retries <= 0:
+                        exception_params = await self.get_exception_params(resp)
+                        raise SpotifyDeviceUnavailableException(**exception_params)
 
-            if check_202 and resp.status == 202:
-                if retries > 0:
                     logger.warning(
                         "Device is temporarily unavailable. Retrying in 5 seconds..."
                     )
+                    resp.release()
+                    retries -= 1
+                    trace.record_retry()
+                    # Retried here rather than through _request so that the
+                    # device retries don't multiply with the @retry attempts
                     await asyncio.sleep(5)
-                    return await self._internal_call(
-                        method, url, payload, params, headers, retries=retries - 1
-                    )
-
-                exception_params = await self.get_exception_params(resp)
-                raise SpotifyDeviceUnavailableException(**exception_params)
+                    continue
+
+                try:
+                    await self._check_response(resp)
+                except SpotifyNotFoundException:
+                    if policy and policy.cache and policy.negative:
+                        await self._cache_not_found(cache_key)
+                    raise
+                except SpotifyRateLimitException as exc:
+                    self.concurrency.backoff()
+                    if resp.status == 429 and exc.retry_after is not None:
+                        logger.warning(
+                            "Reached API rate limit. Retrying in %s seconds...",
+                            exc.retry_after,
+                        )
+                        self.rate_limiter.block(exc.retry_after)
+                    elif resp.status == 429:
+                        logger.warning("Reached API rate limit. Retrying...")
+                    else:
+                        logger.warning("Server error %s. Retrying...", resp.status)
+                    raise
+
+                body = await resp.read()
+                if body and body != b"null":
+                    caching = policy and policy.cache
+                    if raw == "bytes" and not caching:
+                        return body
+
+                    # The cache stores decoded responses, even for raw bytes
+                    results = codec.loads(body)
+                    if caching:
+                        await self._cache_response(
+                            resp.headers.get("etag"), results, cache_key, policy
+                        )
+                    if raw == "bytes":
+                        return body
+                    return self._make_result(url, results, raw)
+                return None
 
-            try:
-                await self._check_response(resp)
-            except SpotifyRateLimitException as exc:
-                logger.warning(
-                    "Reached API rate limit. Retrying in %s seconds...", exc.retry_after
-                )
-                await asyncio.sleep(exc.retry_after)
-                return await self._internal_call(
-                    method, url, payload, params, headers, retries
-                )
+    async def _internal_call(
+        self,
+        method,
+        url,
+        payload,
+        params,
+        headers=None,
+        retries=5,
+        check_202=False,
+        increment_api_calls=False,
+        raw=False,
+        cache=True,
+    ):
+        if method != "GET":
+            return await self._request(
+                method,
+                url,
+                payload,
+                params,
+                headers,
+                retries,
+                check_202,
+                increment_api_calls,
+                raw,
+                cache=cache,
+            )
 
-            text = await resp.text()
-            if text and text != "null":
-                results = json.loads(text)
-                await self._cache_response(resp.headers.get("etag"), results, cache_key)
-                return SpotifyResult(results, _client=self)
+        if payload and not isinstance(payload, (bytes, str)):
+            payload = codec.dumps(payload)
+        params = {k: v for k, v in params.items() if v is not None}
+        cache_key = self._get_cache_key(url, params, payload)
+        result, shared = await self.single_flight.do(
+            f"{cache_key}:{raw}" if raw else cache_key,
+            self._request,
+            method,
+            url,
+            payload,
+            params,
+            headers,
+            retries,
+            check_202,
+            increment_api_calls,
+            raw,
+            cache=cache,
+        )
+        if shared:
+            trace.annotate(cache="coalesced")
+            if isinstance(result, SpotifyResult):
+                return SpotifyResult(result, _client=self)
+            if isinstance(result, Model):
+                return type(result)(deepcopy(result.to_dict()), _client=self)
+            if isinstance(result, (dict, list)):
+                return deepcopy(result)
+        return result
 
     async def _api_call(
         self, method, url, args=None, payload=None, headers=None, **kwargs
@@ -332,6 +784,8 @@ class SpotifyClient(AuthMixin, EmailMixin):
 
         retries = kwargs.pop("retries", 0)
         check_202 = kwargs.pop("check_202", False)
+        raw = kwargs.pop("raw", False)
+        cache = kwargs.pop("cache", True)
         if args:
             kwargs.update(args)
 
@@ -342,10 +796,30 @@ class SpotifyClient(AuthMixin, EmailMixin):
                 logger.exception(e)
 
         if not url.startswith("http"):
-            url = API.PREFIX.value + url
-        return await self._internal_call(
-            method, url, payload, kwargs, headers, retries, check_202
-        )
+            url = self.api_prefix + url
+        span = trace.start_span(method, url)
+        try:
+            return await self._internal_call(
+                method,
+                url,
+                payload,
+                kwargs,
+                headers,
+                retries,
+                check_202,
+                raw=raw,
+                cache=cache,
+            )
+        except SpotifyException as exc:
+            if kwargs.get("device_id") and (
+                isinstance(exc, SpotifyDeviceUnavailableException)
+                or exc.http_status_code == 404
+            ):
+                self.device_registry.invalidate()
+            raise
+        finally:
+            if span:
+                span.finish()
 
     async def _get(self, url, args=None, payload=None, **kwargs):
         return await self._api_call("GET", url, args, payload, **kwargs)
@@ -388,17 +862,10 @@ class SpotifyClient(AuthMixin, EmailMixin):
             - market - an ISO 3166-1 alpha-2 country code.
         """
         track_list = [self._get_track_id(t) for t in tracks]
-
-        batches = [track_list[i : i + 50] for i in range(0, len(track_list), 50)]
-        track_lists = await asyncio.gather(
-            *[
-                self._get(API.TRACKS.value, ids=",".join(t), market=market, **kwargs)
-                for t in batches
-            ]
+        return await self._get_entities(
+            API.TRACKS.value, "tracks", "track", track_list, 50, market, **kwargs
         )
 
-        return list(chain.from_iterable(track_lists))
-
     async def artist(self, artist_id, **kwargs):
         """returns a single artist given the artist's ID, URI or URL
 
@@ -416,13 +883,10 @@ class SpotifyClient(AuthMixin, EmailMixin):
             - artists - a list of  artist IDs, URIs or URLs
         """
         artist_list = [self._get_artist_id(a) for a in artists]
-        batches = [artist_list[i : i + 50] for i in range(0, len(artist_list), 50)]
-        artist_lists = await asyncio.gather(
-            *[self._get(API.ARTISTS.value, ids=",".join(a), **kwargs) for a in batches]
+        return await self._get_entities(
+            API.ARTISTS.value, "artists", "artist", artist_list, 50, **kwargs
         )
 
-        return list(chain.from_iterable(artist_lists))
-
     async def artist_albums(
         self, artist_id, album_type=None, country=None, limit=20, offset=0, **kwargs
     ):
@@ -505,8 +969,10 @@ class SpotifyClient(AuthMixin, EmailMixin):
         Parameters:
             - albums - a list of  album IDs, URIs or URLs
         """
-        album_list = map(self._get_album_id, albums)
-        return await self._get(API.ALBUMS.value, ids=",".join(album_list), **kwargs)
+        album_list = [self._get_album_id(a) for a in albums]
+        return await self._get_entities(
+            API.ALBUMS.value, "albums", "album", album_list, 20, wrap=True, **kwargs
+        )
 
     async def search(self, url, q, limit=10, offset=0, market="from_token", **kwargs):
         """searches for an item
@@ -1287,17 +1753,16 @@ class SpotifyClient(AuthMixin, EmailMixin):
                 cached_tracks = select(a for a in AudioFeatures if a.id in tracks)[:]
                 tracks = list(set(tracks) - {a.id for a in cached_tracks})
 
-        batches = [tracks[i : i + 100] for i in range(0, len(tracks), 100)]
-        audio_features = await asyncio.gather(
-            *[
-                self._get(API.AUDIO_FEATURES_MULTIPLE.value, ids=",".join(t), **kwargs)
-                for t in batches
-            ]
+        audio_features = await self._get_entities(
+            API.AUDIO_FEATURES_MULTIPLE.value,
+            "audio_features",
+            "audio_features",
+            tracks,
+            100,
+            **kwargs,
         )
 
-        if not with_cache:
-            audio_features = list(chain.from_iterable(audio_features))
-        else:
+        if with_cache:
             with db_session:
                 new_cached_tracks = select(a for a in AudioFeatures if a.id in tracks)[
                     :
@@ -1306,17 +1771,24 @@ class SpotifyClient(AuthMixin, EmailMixin):
                 audio_features = (
                     [
                         AudioFeatures.from_dict(t)
-                        for t in chain.from_iterable(audio_features)
-                        if t["id"] not in new_cached_track_ids
+                        for t in audio_features
+                        if t and t["id"] not in new_cached_track_ids
                     ]
                     + cached_tracks
                     + new_cached_tracks
                 )
         return audio_features
 
+    @property
+    def device_registry(self):
+        return get_device_registry(self.user_id)
+
     async def devices(self, **kwargs):
         """Get a list of user's available devices."""
-        return await self._get(API.DEVICES.value, check_202=True, **kwargs)
+        result = await self._get(API.DEVICES.value, check_202=True, **kwargs)
+        if result:
+            self.device_registry.update(result.devices)
+        return result
 
     async def get_device_id(self, device=None):
         if isinstance(device, (str, bytes)) and DEVICE_ID_RE.match(device):
@@ -1325,36 +1797,47 @@ class SpotifyClient(AuthMixin, EmailMixin):
         device = await self.get_device(device)
         return device.id
 
-    async def get_device(self, device=None, only_active=True):
+    async def get_device(self, device=None, only_active=True, refresh=False):
         """Get Spotify device based on name
 
+        Devices are looked up in the user's device registry and only fetched
+        again when the registry expired or the device can't be found in it.
+
         :param str, optional device: device name or ID
-        :param str, optional field: device attribute to return
+        :param bool, optional refresh: fetch the devices even if the registry is fresh
 
         str or dict: Spotify device
         """
-        devices = (await self.devices()).devices
-        device_names = ", ".join([d.name for d in devices])
+        registry = self.device_registry
+        refreshed = refresh or not registry.fresh
+        if refreshed:
+            await self.devices()
+
         device_name_or_id = device
         if not device_name_or_id:
-            if only_active:
-                device = first(devices, key=attrgetter("is_active"))
-                if not device:
-                    raise ValueError(
-                        f"""
+            device = first(registry.devices, key=attrgetter("is_active"))
+            if not (device or only_active):
+                device = first(registry.devices)
+        else:
+            device = registry.get(device_name_or_id)
+
+        if not device and not refreshed:
+            return await self.get_device(device_name_or_id, only_active, refresh=True)
+
+        device_names = ", ".join([d.name for d in registry.devices])
+        if not device_name_or_id and only_active and not device:
+            raise ValueError(
+                f"""
             There's no active device.
             Possible devices: {device_names}"""
-                    )
-            else:
-                device = first(devices, key=attrgetter("is_active")) or first(devices)
-        else:
-            device = first(devices, key=lambda d: device_name_or_id in (d.name, d.id))
-            if not device:
-                raise ValueError(
-                    f"""
+            )
+
+        if device_name_or_id and not device:
+            raise ValueError(
+                f"""
         Device {device_name_or_id} doesn't exist.
         Possible devices: {device_names}"""
-                )
+            )
 
         return device
 
@@ -1396,7 +1879,11 @@ class SpotifyClient(AuthMixin, EmailMixin):
         """
         device_id = await self.get_device_id(device)
         data = {"device_ids": [device_id], "play": force_play}
-        return await self._put(API.PLAYER.value, payload=data, check_202=True, **kwargs)
+        result = await self._put(
+            API.PLAYER.value, payload=data, check_202=True, **kwargs
+        )
+        self.device_registry.set_active(device_id)
+        return result
 
     async def start_playback(
         self,
@@ -1518,6 +2005,7 @@ class SpotifyClient(AuthMixin, EmailMixin):
             check_202=True,
             **kwargs,
         )
+        self.device_registry.update_state(device.id, volume_percent=volume_percent)
 
     async def shuffle(self, state, device=None, **kwargs):
         """Toggle playback shuffling.
@@ -1,16 +1,28 @@
+import asyncio
 import random
-from urllib.parse import parse_qs, urlparse, urlunparse
+from urllib.parse import parse_qs, urlencode, urlparse, urlunparse
 
 import addict
 from cached_property import cached_property
 
-from .. import config
+from .. import config, logger
+from ..codec import codec
 from ..constants import API
-from . import limited_as_completed
+from . import limited_as_completed, should_ignore_exception
 
 LOCAL_ATTRIBUTES = {"_client", "_next_result", "_next_result_available", "_playable"}
 
 
+def to_plain(value):
+    if isinstance(value, dict):
+        return {k: to_plain(v) for k, v in value.items()}
+
+    if isinstance(value, (list, tuple)):
+        return [to_plain(v) for v in value]
+
+    return value
+
+
 class Playable:
     def __init__(self, result):
         self.result = result
@@ -47,33 +59,133 @@ class Playable:
 
 
 class SpotifyResultIterator:
-    def __init__(self, result, limit=None, ignore_exceptions=False):
+    def __init__(
+        self,
+        result,
+        limit=None,
+        ignore_exceptions=False,
+        raw=False,
+        ordered=False,
+        max_pages=None,
+    ):
         self.result = result
         self.limit = limit
+        self.raw = raw
         self.params_list = self.result.get_next_params_list(limit)
         self.requests = (
-            self.result._get_with_params(params) for params in self.params_list
+            self.result._get_with_params(params, raw=raw) for params in self.params_list
         )
         self.responses = limited_as_completed(
             self.requests,
-            config.http.concurrent_connections,
+            self.result._client.concurrency,
             ignore_exceptions=ignore_exceptions,
+            ordered=ordered,
+            max_pending=max_pages
+            or (config.http.max_buffered_pages or 20 if ordered else None),
         )
 
     def __aiter__(self):
         return self.iterate()
 
     async def iterate(self):
-        for item in self.result:
-            yield item
+        if self.raw == "bytes":
+            yield codec.dumpb(self.result.to_dict())
+        else:
+            for item in self.page_items(self.result):
+                yield item
 
         # pylint: disable=not-an-iterable
         async for responses in self.responses:
             if responses is None:
                 continue
-            for response in responses:
+            if self.raw == "bytes":
+                yield responses
+                continue
+            for response in self.page_items(responses):
                 yield response
 
+    def page_items(self, page):
+        if not self.raw:
+            return page
+        if isinstance(page, SpotifyResult):
+            page = page.to_dict()
+        return SpotifyResult.page_items(page)
+
+
+class SpotifyCursorIterator(SpotifyResultIterator):
+    """Iterates cursor paginated results like followed artists or recently played
+
+    The next page can only be requested once the previous one arrived, so
+    pages are fetched in the background while the current one is consumed,
+    keeping up to ``lookahead`` pages ready in a queue.
+    """
+
+    # pylint: disable=super-init-not-called
+    def __init__(
+        self, result, limit=None, ignore_exceptions=False, raw=False, lookahead=None
+    ):
+        self.result = result
+        self.limit = limit
+        self.raw = raw
+        self.ignore_exceptions = ignore_exceptions
+        self.lookahead = lookahead or config.http.prefetch_pages or 2
+
+    def next_url(self, page):
+        url = SpotifyResult.cursor_paging(page)["next"]
+        if not url or not self.limit:
+            return url
+
+        url = urlparse(url)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        return urlunparse(
+            url._replace(query=urlencode({**params, "limit": self.limit}))
+        )
+
+    async def fetch_pages(self, queue):
+        url = self.next_url(self.result)
+        while url:
+            try:
+                page = await self.result._client._get(
+                    url, raw=True if self.raw == "bytes" else self.raw
+                )
+            except Exception as exc:
+                if not should_ignore_exception(exc, self.ignore_exceptions):
+                    await queue.put(exc)
+                    return
+                logger.warning("Ignoring exception:")
+                logger.exception(exc)
+                break
+
+            if not page:
+                break
+            await queue.put(page)
+            url = self.next_url(page)
+        await queue.put(None)
+
+    async def iterate(self):
+        if self.raw == "bytes":
+            yield codec.dumpb(self.result.to_dict())
+        else:
+            for item in self.page_items(self.result):
+                yield item
+
+        queue = asyncio.Queue(maxsize=self.lookahead)
+        fetcher = asyncio.ensure_future(self.fetch_pages(queue))
+        try:
+            while True:
+                page = await queue.get()
+                if page is None:
+                    break
+                if isinstance(page, Exception):
+                    raise page
+                if self.raw == "bytes":
+                    yield codec.dumpb(page)
+                    continue
+                for item in self.page_items(page):
+                    yield item
+        finally:
+            fetcher.cancel()
+
 
 class SpotifyResult(addict.Dict):
     ITER_KEYS = (
@@ -90,7 +202,6 @@ class SpotifyResult(addict.Dict):
         super().__init__(*args, **kwargs)
         self._client = _client
         self._next_result = None
-        self._playable = Playable(self)
 
     def __missing__(self, name):
         return addict.Dict(__parent=self, __key=name)
@@ -135,6 +246,13 @@ class SpotifyResult(addict.Dict):
     def values(self):
         return [v for k, v in self.items()]
 
+    def to_dict(self):
+        return to_plain(self)
+
+    @cached_property
+    def _playable(self):
+        return Playable(self)
+
     async def play(self, device=None, index=None):
         return await self._playable.play(device, index)
 
@@ -142,8 +260,8 @@ class SpotifyResult(addict.Dict):
     def base_url(self):
         return urlunparse([*urlparse(self.href)[:3], "", "", ""])
 
-    async def _get_with_params(self, params, url=None):
-        return await self._client._get(url or self.base_url, **params)
+    async def _get_with_params(self, params, url=None, raw=False):
+        return await self._client._get(url or self.base_url, raw=raw, **params)
 
     async def _put_with_params(self, params, url=None):
         return await self._client._put(url or self.base_url, **params)
@@ -162,20 +280,77 @@ class SpotifyResult(addict.Dict):
 
         return []
 
-    async def all(self, limit=None):
+    @classmethod
+    def cursor_paging(cls, page):
+        """The paging object of a cursor paginated page, or None"""
+        if "cursors" in page:
+            return page
+
+        for key in cls.ITER_KEYS:
+            if key in page and isinstance(page[key], dict) and "cursors" in page[key]:
+                return page[key]
+
+        return None
+
+    @classmethod
+    def page_items(cls, page):
+        """Items of a plain decoded page, the same ones iterating a result yields"""
+        for key in cls.ITER_KEYS:
+            if key in page:
+                if isinstance(page[key], dict) and "items" in page[key]:
+                    return page[key]["items"]
+
+                return page[key]
+
+        return []
+
+    async def all(self, limit=None, raw=False, ordered=False):
         # pylint: disable=not-an-iterable
-        return [item async for item in self.iterall(limit)]
+        return [item async for item in self.iterall(limit, raw=raw, ordered=ordered)]
 
     async def next(self):
         if "_next_result" in self and self._next_result:
             return self._next_result
 
-        if "next" in self and self["next"]:
-            return await self._client._get(self["next"])
+        paging = self.cursor_paging(self) or self
+        if "next" in paging and paging["next"]:
+            return await self._client._get(paging["next"])
 
         return None
 
-    def iterall(self, limit=None, ignore_exceptions=False):
+    def iterall(
+        self,
+        limit=None,
+        ignore_exceptions=False,
+        raw=False,
+        ordered=False,
+        max_pages=None,
+    ):
+        """Iterate the items of this page and of the remaining ones
+
+        Pages are requested concurrently and their items are yielded as the
+        pages arrive, or in offset order if ``ordered`` is True. Ordered
+        iteration holds at most ``max_pages`` pages (requested or waiting
+        for an earlier one) so that large libraries stream in bounded memory.
+
+        :param raw: True to get the items as plain dicts, "bytes" to get the
+                    undecoded body of each page instead of items
+        :param max_pages: defaults to http.max_buffered_pages when ordered
+        """
+        if self.cursor_paging(self) is not None:
+            return SpotifyCursorIterator(
+                self,
+                limit=limit,
+                ignore_exceptions=ignore_exceptions,
+                raw=raw,
+                lookahead=max_pages,
+            )
+
         return SpotifyResultIterator(
-            self, limit=limit, ignore_exceptions=ignore_exceptions
+            self,
+            limit=limit,
+            ignore_exceptions=ignore_exceptions,
+            raw=raw,
+            ordered=ordered,
+            max_pages=max_pages,
         )
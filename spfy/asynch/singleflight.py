@@ -0,0 +1,47 @@
+import asyncio
+
+from .. import logger
+
+
+class SingleFlight:
+    """Coalesces concurrent identical calls into a single in-flight task.
+
+    The first caller for a key starts the task, every caller arriving before
+    it finishes awaits the same task instead of starting its own. Callers are
+    shielded from each other so that a cancelled caller doesn't cancel the
+    request for everyone else.
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def in_flight(self):
+        return len(self.calls)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "in_flight": self.in_flight}
+
+    def _forget(self, key, task):
+        if self.calls.get(key) is task:
+            del self.calls[key]
+
+    async def do(self, key, coro_fn, *args, **kwargs):
+        """Await ``coro_fn(*args, **kwargs)`` or the identical call already running
+
+        Returns a ``(result, shared)`` tuple where ``shared`` is True if the
+        result came from a call started by another caller.
+        """
+        task = self.calls.get(key)
+        if task is not None:
+            self.hits += 1
+            logger.debug("Joined in-flight request: %s", key)
+            return await asyncio.shield(task), True
+
+        self.misses += 1
+        task = asyncio.ensure_future(coro_fn(*args, **kwargs))
+        self.calls[key] = task
+        task.add_done_callback(lambda t: self._forget(key, t))
+        return await asyncio.shield(task), False
@@ -1,11 +1,19 @@
 import functools
 from collections import OrderedDict
 
+from .compression import compress, compression_stats, decompress
 from .db import *
+from .devices import DeviceRegistry, get_device_registry
+from .memory import MemoryCache
+from .negative import NegativeCache, negative_cache
+from .policies import CachePolicy, cache_policy
+from .responses import ResponseCache
+from .usage import ApiCallCounter, api_call_counter
 
 
 def async_lru(maxsize=100):
     cache = OrderedDict()
+    info = {"hits": 0, "misses": 0}
 
     def decorator(fn):
         @functools.wraps(fn)
@@ -13,12 +21,18 @@ def async_lru(maxsize=100):
             key = str((args, kwargs))
             try:
                 cache[key] = cache.pop(key)
+                info["hits"] += 1
             except KeyError:
+                info["misses"] += 1
                 if len(cache) >= maxsize:
                     cache.popitem(last=False)
                 cache[key] = await fn(*args, **kwargs)
             return cache[key]
 
+        def cache_info():
+            return {**info, "maxsize": maxsize, "currsize": len(cache)}
+
+        memoizer.cache_info = cache_info
         return memoizer
 
     return decorator
@@ -0,0 +1,126 @@
+import zlib
+
+from .. import config, logger
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+# 0xc1 is never used by msgpack, so entries written before compression was
+# enabled (or below the threshold) are still read as plain msgpack
+MARKER = b"\xc1"
+
+
+# pylint: disable=too-few-public-methods
+class Compressor:
+    """Compression used for cached response payloads
+
+    ``id`` is the byte written after the marker so that entries compressed
+    with a different compressor can still be read.
+    """
+
+    # pylint: disable=redefined-builtin,redefined-outer-name
+    def __init__(self, name, id, compress, decompress):
+        self.name = name
+        self.id = id
+        self.compress = compress
+        self.decompress = decompress
+
+    def __repr__(self):
+        return f"<Compressor {self.name}>"
+
+
+COMPRESSORS = {
+    "zlib": Compressor(
+        "zlib", 1, lambda data, level: zlib.compress(data, level or 6), zlib.decompress
+    )
+}
+if zstandard is not None:
+    COMPRESSORS["zstd"] = Compressor(
+        "zstd",
+        2,
+        lambda data, level: zstandard.ZstdCompressor(level=level or 3).compress(data),
+        lambda data: zstandard.ZstdDecompressor().decompress(data),
+    )
+if lz4 is not None:
+    COMPRESSORS["lz4"] = Compressor(
+        "lz4",
+        3,
+        lambda data, level: lz4.frame.compress(data, compression_level=level or 0),
+        lz4.frame.decompress,
+    )
+COMPRESSORS_BY_ID = {c.id: c for c in COMPRESSORS.values()}
+
+
+def get_compressor(name=None):
+    name = name or config.cache.compression.codec
+    if not name or name == "none":
+        return None
+    if name not in COMPRESSORS:
+        logger.info("Compression %s is not available, using zlib", name)
+        return COMPRESSORS["zlib"]
+    return COMPRESSORS[name]
+
+
+class CompressionStats:
+    """Sizes of the payloads written to the cache, before and after compression"""
+
+    def __init__(self):
+        self.entries = 0
+        self.compressed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    @property
+    def ratio(self):
+        return self.bytes_in / self.bytes_out if self.bytes_out else 1.0
+
+    def record(self, size, stored_size):
+        self.entries += 1
+        self.compressed += stored_size != size
+        self.bytes_in += size
+        self.bytes_out += stored_size
+
+    def to_dict(self):
+        return {
+            "entries": self.entries,
+            "compressed": self.compressed,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "ratio": self.ratio,
+        }
+
+
+compressor = get_compressor()
+compression_stats = CompressionStats()
+
+
+def compress(data):
+    """Compress a msgpack payload if it's larger than the configured threshold"""
+    stored = data
+    threshold = config.cache.compression.threshold or 16_384
+    if compressor is not None and len(data) >= threshold:
+        compressed = compressor.compress(data, config.cache.compression.level)
+        if len(compressed) + 2 < len(data):
+            stored = MARKER + bytes((compressor.id,)) + compressed
+
+    compression_stats.record(len(data), len(stored))
+    return stored
+
+
+def decompress(data):
+    if data[:1] != MARKER:
+        return data
+
+    try:
+        return COMPRESSORS_BY_ID[data[1]].decompress(data[2:])
+    except KeyError:
+        raise ValueError(
+            f"Cache entry is compressed with an unknown codec {data[1]}"
+        ) from None
@@ -0,0 +1,69 @@
+import threading
+import time
+
+from .. import config
+
+
+class DeviceRegistry:
+    """Short lived cache of a user's devices.
+
+    Keeps the last ``/me/player/devices`` response for ``ttl`` seconds so that
+    player commands can resolve device names without an extra round trip.
+    Devices can be looked up by name or id and their cached state is updated
+    after commands that change it.
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl or config.player.devices_ttl or 10
+        self.lock = threading.Lock()
+        self.devices = []
+        self.by_id = {}
+        self.by_name = {}
+        self.fetched_at = None
+
+    @property
+    def fresh(self):
+        return (
+            self.fetched_at is not None
+            and time.monotonic() - self.fetched_at < self.ttl
+        )
+
+    def update(self, devices):
+        with self.lock:
+            self.devices = list(devices)
+            self.by_id = {d.id: d for d in self.devices}
+            self.by_name = {d.name: d for d in self.devices}
+            self.fetched_at = time.monotonic()
+
+    def get(self, name_or_id):
+        with self.lock:
+            return self.by_id.get(name_or_id) or self.by_name.get(name_or_id)
+
+    def update_state(self, device_id, **state):
+        with self.lock:
+            device = self.by_id.get(device_id)
+            if device:
+                device.update(state)
+
+    def set_active(self, device_id):
+        with self.lock:
+            if device_id not in self.by_id:
+                return
+
+            for device in self.devices:
+                device.is_active = device.id == device_id
+
+    def invalidate(self):
+        with self.lock:
+            self.fetched_at = None
+
+
+DEVICE_REGISTRIES = {}
+DEVICE_REGISTRIES_LOCK = threading.Lock()
+
+
+def get_device_registry(user_id):
+    with DEVICE_REGISTRIES_LOCK:
+        if user_id not in DEVICE_REGISTRIES:
+            DEVICE_REGISTRIES[user_id] = DeviceRegistry()
+        return DEVICE_REGISTRIES[user_id]
@@ -0,0 +1,73 @@
+from collections import OrderedDict
+
+from .. import config
+
+
+class MemoryCache:
+    """Bounded in-process LRU cache that evicts by total size in bytes
+
+    Values are stored with the size they were given (for responses, the
+    length of their msgpack encoding). Values larger than ``max_item_size``
+    are not admitted so that a single big response can't flush the cache.
+    """
+
+    def __init__(self, max_size=None, max_item_size=None):
+        self.max_size = max_size or config.cache.memory.max_size or 67_108_864
+        self.max_item_size = (
+            max_item_size or config.cache.memory.max_item_size or self.max_size // 8
+        )
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key):
+        try:
+            value, size = self.entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return None
+
+        self.entries[key] = (value, size)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, size):
+        self.invalidate(key)
+        if size > self.max_item_size:
+            return False
+
+        while self.entries and self.size + size > self.max_size:
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.size -= evicted_size
+            self.evictions += 1
+
+        self.entries[key] = (value, size)
+        self.size += size
+        return True
+
+    def invalidate(self, key):
+        entry = self.entries.pop(key, None)
+        if entry:
+            self.size -= entry[1]
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "size": self.size,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,57 @@
+import threading
+import time
+from collections import OrderedDict
+
+from .. import config
+
+
+class NegativeCache:
+    """Short lived set of requests and entity ids that Spotify doesn't know
+
+    Requests that came back with a 404 and ids returned as null by a batch
+    endpoint are remembered for ``ttl`` seconds so that they are not
+    requested again every time they come up. The oldest keys are dropped
+    once there are more than ``max_entries``.
+    """
+
+    def __init__(self, ttl=None, max_entries=None):
+        self.ttl = ttl or config.cache.negative.expire or 3600
+        self.max_entries = max_entries or config.cache.negative.max_entries or 100_000
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def __contains__(self, key):
+        with self.lock:
+            expires_at = self.entries.get(key)
+            if expires_at is None:
+                return False
+
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return False
+
+            return True
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = time.monotonic() + self.ttl
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def discard(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        return {"entries": len(self.entries), "max_entries": self.max_entries}
+
+
+negative_cache = NegativeCache()
@@ -0,0 +1,67 @@
+from functools import lru_cache
+
+from .. import config
+from ..constants import API
+from ..trace import endpoint_template
+
+ENDPOINT_NAMES = {
+    e.value.split("?")[0]: e.name.lower() for e in API if e.value.startswith("/v1")
+}
+
+
+class CachePolicy:
+    """How long a cached response of an endpoint can be used as is
+
+    Within ``ttl`` seconds of being fetched a response is served straight
+    from the cache. For ``stale`` more seconds it is still served, but it is
+    revalidated in the background. After that it is only used to answer a
+    conditional request. Endpoints with ``cache = false`` are never cached.
+    404s are only remembered for endpoints with ``negative = true``, which
+    should be catalog endpoints whose responses don't depend on the user.
+    """
+
+    __slots__ = ("name", "ttl", "stale", "cache", "negative")
+
+    def __init__(self, name, ttl=0, stale=0, cache=True, negative=False):
+        self.name = name
+        self.ttl = ttl
+        self.stale = stale
+        self.cache = cache
+        self.negative = negative
+
+    def __repr__(self):
+        return (
+            f"<CachePolicy {self.name} ttl={self.ttl} stale={self.stale}"
+            f" cache={self.cache} negative={self.negative}>"
+        )
+
+    @property
+    def expire(self):
+        """Seconds to keep the response in Redis"""
+        return max(config.cache.expire, self.ttl + self.stale)
+
+    def state(self, age):
+        """``fresh``, ``stale`` or ``expired`` for a response fetched ``age`` seconds ago"""
+        if age < self.ttl:
+            return "fresh"
+        if age < self.ttl + self.stale:
+            return "stale"
+        return "expired"
+
+
+@lru_cache(maxsize=None)
+def get_cache_policy(template):
+    name = ENDPOINT_NAMES.get(template, template)
+    policy = config.cache.policies[name] or config.cache.policies.default or {}
+    return CachePolicy(
+        name,
+        ttl=policy.get("ttl", 0),
+        stale=policy.get("stale", 0),
+        cache=policy.get("cache", True),
+        negative=policy.get("negative", False),
+    )
+
+
+def cache_policy(url):
+    """Freshness policy for a request URL, looked up by its endpoint name"""
+    return get_cache_policy(endpoint_template(url))
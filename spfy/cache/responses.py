@@ -0,0 +1,166 @@
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import msgpack
+
+from .. import config, logger
+
+RESPONSES_FILE = Path.home() / ".cache" / "spfy" / "responses.sqlite"
+
+
+class ResponseCache:
+    """SQLite store for ETag validated API responses.
+
+    Each row keeps the ETag and the msgpack encoded body of a response.
+    Rows not used for ``expire`` seconds are dropped on read and the least
+    recently used rows are evicted once the cache grows past ``max_size``
+    bytes or ``max_entries`` rows.
+
+    The total size and row count are kept in memory and only recounted from
+    the table when they go over the limits, and the access time of a row is
+    written at most once per ``touch_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        filename=None,
+        max_size=None,
+        max_entries=None,
+        expire=None,
+        touch_interval=None,
+    ):
+        self.filename = Path(
+            os.path.expandvars(
+                str(filename or config.cache.sqlite.filename or RESPONSES_FILE)
+            )
+        )
+        self.max_size = max_size or config.cache.sqlite.max_size or 100 * 1024 * 1024
+        self.max_entries = max_entries or config.cache.sqlite.max_entries or 20_000
+        self.expire = expire or config.cache.expire
+        self.touch_interval = min(
+            touch_interval or config.cache.sqlite.touch_interval or 60,
+            self.expire / 2,
+        )
+        self.lock = threading.Lock()
+        self.evictions = 0
+
+        self.filename.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(
+            str(self.filename), check_same_thread=False, isolation_level=None
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                etag TEXT NOT NULL,
+                response BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)"
+        )
+        self.size, self.entries = self._count()
+
+    def get(self, key):
+        """Return the cached ``(etag, results)`` pair for key or None."""
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT etag, response, accessed_at FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if not row:
+                return None
+
+            etag, response, accessed_at = row
+            if accessed_at + self.expire < now:
+                self._delete(key)
+                return None
+
+            if accessed_at + self.touch_interval < now:
+                self.conn.execute(
+                    "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+                )
+
+        try:
+            return etag, msgpack.loads(response, raw=False)
+        except Exception:
+            logger.error("Cached response is invalid: %s", key)
+            self.delete(key)
+            return None
+
+    def set(self, key, etag, results):
+        response = msgpack.dumps(results)
+        with self.lock:
+            self._delete(key)
+            self.conn.execute(
+                """INSERT OR REPLACE INTO responses (key, etag, response, size, accessed_at)
+                VALUES (?, ?, ?, ?, ?)""",
+                (key, etag, response, len(response), time.time()),
+            )
+            self.size += len(response)
+            self.entries += 1
+            self._evict()
+        return len(response)
+
+    def delete(self, key):
+        with self.lock:
+            self._delete(key)
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM responses")
+            self.size = self.entries = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                "entries": self.entries,
+                "size": self.size,
+                "evictions": self.evictions,
+            }
+
+    def _count(self):
+        return self.conn.execute(
+            "SELECT COALESCE(SUM(size), 0), COUNT(*) FROM responses"
+        ).fetchone()
+
+    def _delete(self, key):
+        row = self.conn.execute(
+            "SELECT size FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row:
+            self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.size -= row[0]
+            self.entries -= 1
+
+    def _evict(self):
+        if self.size <= self.max_size and self.entries <= self.max_entries:
+            return
+
+        # Other processes can share the file, so recount before evicting
+        size, entries = self._count()
+        if size <= self.max_size and entries <= self.max_entries:
+            self.size, self.entries = size, entries
+            return
+
+        evicted = []
+        for key, row_size in self.conn.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at"
+        ):
+            if size <= self.max_size and entries <= self.max_entries:
+                break
+
+            evicted.append((key,))
+            size -= row_size
+            entries -= 1
+
+        self.conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        self.size, self.entries = size, entries
+        self.evictions += len(evicted)
+        logger.debug("Evicted %d cached responses", len(evicted))
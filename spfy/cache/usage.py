@@ -0,0 +1,101 @@
+import atexit
+import threading
+from datetime import datetime
+from uuid import UUID
+
+from pony.orm import db_session
+
+from .. import config, logger
+from ..sql import SQL
+from .db import db
+
+
+def get_flush_interval():
+    interval = config.database.api_calls.flush_interval
+    if isinstance(interval, (int, float)):
+        return interval
+    return 30
+
+
+class ApiCallCounter:
+    """Write-behind accumulator for the ``api_calls`` column of ``users``.
+
+    Increments are kept in memory per user and written every ``flush_interval``
+    seconds (and on exit) as a single UPDATE for all pending users, instead of
+    one UPDATE on the same row for every request. A ``flush_interval`` of 0
+    writes every increment right away.
+    """
+
+    def __init__(self, flush_interval=None):
+        self.flush_interval = (
+            get_flush_interval() if flush_interval is None else flush_interval
+        )
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.timer = None
+        atexit.register(self.flush)
+
+    def increment(self, user_id, calls=1):
+        user_id = UUID(str(user_id))
+        now = datetime.utcnow()
+        with self.lock:
+            pending_calls, _ = self.counts.get(user_id, (0, None))
+            self.counts[user_id] = (pending_calls + calls, now)
+            if self.flush_interval > 0 and not self.timer:
+                self.timer = threading.Timer(self.flush_interval, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+        if self.flush_interval <= 0:
+            self.flush()
+
+    def pending(self, user_id=None):
+        """Number of calls not yet written, for one user or per user."""
+        with self.lock:
+            if user_id is not None:
+                return self.counts.get(UUID(str(user_id)), (0, None))[0]
+            return {user_id: calls for user_id, (calls, _) in self.counts.items()}
+
+    def flush(self):
+        with self.lock:
+            counts, self.counts = self.counts, {}
+            if self.timer:
+                self.timer.cancel()
+                self.timer = None
+
+        if not counts:
+            return 0
+
+        uuid_converter = db.provider.get_converter_by_py_type(UUID)
+        datetime_converter = db.provider.get_converter_by_py_type(datetime)
+        values = []
+        params = {}
+        for i, (user_id, (calls, last_usage_at)) in enumerate(counts.items()):
+            values.append(f"($id_{i}, $calls_{i}, $at_{i})")
+            params[f"id_{i}"] = uuid_converter.py2sql(user_id)
+            params[f"calls_{i}"] = calls
+            params[f"at_{i}"] = datetime_converter.py2sql(last_usage_at)
+
+        try:
+            with db_session:
+                db.execute(
+                    SQL.increment_api_calls.format(values=", ".join(values)),
+                    globals={},
+                    locals=params,
+                )
+        except Exception as exc:
+            logger.warning("Could not write API call counts: %s", exc)
+            with self.lock:
+                for user_id, (calls, last_usage_at) in counts.items():
+                    pending_calls, newer_usage_at = self.counts.get(user_id, (0, None))
+                    self.counts[user_id] = (
+                        pending_calls + calls,
+                        newer_usage_at or last_usage_at,
+                    )
+            return 0
+
+        logger.debug("Wrote API call counts for %d users", len(counts))
+        return sum(calls for calls, _ in counts.values())
+
+
+api_call_counter = ApiCallCounter()
@@ -1,7 +1,7 @@
 # coding: utf-8
 # pylint: disable=too-many-lines,too-many-public-methods
-from datetime import datetime
 from functools import lru_cache, partialmethod
+from hashlib import sha1
 from itertools import chain
 from operator import attrgetter
 from time import sleep
@@ -9,8 +9,19 @@ from time import sleep
 import ujson as json
 from first import first
 
-from . import logger
-from .cache import AudioFeatures, Playlist, db, db_session, select
+from . import config, logger, stats, trace
+from .codec import codec
+from .cache import (
+    AudioFeatures,
+    Playlist,
+    ResponseCache,
+    api_call_counter,
+    db,
+    db_session,
+    cache_policy,
+    get_device_registry,
+    negative_cache,
+)
 from .constants import (
     API,
     DEVICE_ID_RE,
@@ -24,33 +35,95 @@ from .exceptions import (
     SpotifyDeviceUnavailableException,
     SpotifyException,
     SpotifyForbiddenException,
+    SpotifyNotFoundException,
     SpotifyRateLimitException,
 )
 from .mixins import AuthMixin, EmailMixin
+from .models import from_response, unwrap
+from .pool import get_executor
+from .ratelimit import backoff_delay, get_max_retries, get_rate_limiter
 from .result import SpotifyResult
+from .sql import SQL
 
 
 class SpotifyClient(AuthMixin, EmailMixin):
-    def __init__(self, *args, proxies=None, requests_timeout=None, **kwargs):
+    result_class = SpotifyResult
+
+    def __init__(
+        self,
+        *args,
+        proxies=None,
+        requests_timeout=None,
+        response_cache=None,
+        models=False,
+        api_prefix=None,
+        recorder=None,
+        **kwargs,
+    ):
         """
         Create a Spotify API object.
 
         :param proxies: Definition of proxies
         :param requests_timeout: Tell Requests to stop waiting for a response after a given number of seconds
-        """
+        :param response_cache: ResponseCache used for ETag revalidation of GET requests
+        :param models: Return lightweight models from spfy.models instead of SpotifyResult
+        :param api_prefix: Base URL of the API, e.g. a local spfy.replay.FakeSpotify.
+                           Tokens are then requested from {api_prefix}/api/token
+        :param recorder: spfy.replay.Cassette that records every API call
+        """
+        api_prefix = api_prefix or config.http.api_prefix or API.PREFIX.value
+        if api_prefix != API.PREFIX.value:
+            # Fake APIs like spfy.replay.FakeSpotify serve the token endpoint too
+            kwargs.setdefault("token_url", f"{api_prefix}/api/token")
         super().__init__(*args, **kwargs)
         self.proxies = proxies
         self.requests_timeout = requests_timeout
+        self.response_cache = response_cache
+        self.models = models
+        self.api_prefix = api_prefix
+        self.recorder = recorder
+        self.rate_limiter = get_rate_limiter(self.client_id)
+
+    def _make_result(self, url, results, raw=False):
+        if raw == "bytes":
+            return codec.dumpb(results)
+        if raw or isinstance(results, list):
+            return results
+        if self.models:
+            return from_response(url, results, self)
+        return self.result_class(results, _client=self)
 
-    @db_session
     def _increment_api_call_count(self):
-        try:
-            user = self.user
-        except Exception:
-            logger.warning("Tried to use an inexistent user: %s", self.user_id)
-        else:
-            user.api_calls += 1
-            user.last_usage_at = datetime.utcnow()
+        api_call_counter.increment(self.user_id)
+
+    @property
+    def pending_api_calls(self):
+        """API calls made by this user that are not yet written to the database"""
+        return api_call_counter.pending(self.user_id)
+
+    def cache_stats(self, filename=None):
+        """Counters of every cache used by the client
+
+        Endpoint counters are collected per process from finished API calls,
+        only when ``cache.stats.enabled`` is set or after
+        ``trace.add_sink(stats.cache_stats)``, since they need tracing.
+        If ``filename`` is given the stats are also written there as JSON.
+        """
+        cache_stats = {
+            "endpoints": stats.cache_stats.to_dict(),
+            "responses": self.response_cache.stats() if self.response_cache else None,
+            "negative": negative_cache.stats(),
+            "lru_cache": {
+                # pylint: disable=no-value-for-parameter,no-member
+                "artist_related_artists": (
+                    SpotifyClient.artist_related_artists.cache_info()._asdict()
+                )
+            },
+            "queries": stats.query_stats(db),
+        }
+        if filename:
+            stats.export(cache_stats, filename)
+        return cache_stats
 
     @staticmethod
     def _check_response(response):
@@ -61,14 +134,18 @@ class SpotifyClient(AuthMixin, EmailMixin):
             if response.status_code == 429 or (
                 response.status_code >= 500 and response.status_code < 600
             ):
+                retry_after = response.headers.get("Retry-After")
                 raise SpotifyRateLimitException(
-                    retry_after=int(response.headers.get("Retry-After", 0)),
+                    retry_after=int(retry_after) if retry_after is not None else None,
                     **exception_params,
                 ) from exc
 
             if response.status_code == 403:
                 raise SpotifyForbiddenException(**exception_params) from exc
 
+            if response.status_code == 404:
+                raise SpotifyNotFoundException(**exception_params) from exc
+
             raise SpotifyException(**exception_params) from exc
 
     @staticmethod
@@ -80,27 +157,93 @@ class SpotifyClient(AuthMixin, EmailMixin):
             "text": response.text,
         }
 
+    def ensure_response_cache(self):
+        if not self.response_cache:
+            self.response_cache = ResponseCache()
+
+    @staticmethod
+    def _get_cache_key(url, params, payload):
+        cache_key = sha1(url.encode())
+        if params:
+            cache_key.update(json.dumps(params).encode())
+        if payload:
+            if isinstance(payload, str):
+                payload = payload.encode()
+            cache_key.update(payload)
+        return cache_key.hexdigest()
+
+    # pylint: disable=too-many-locals,too-many-branches,too-many-statements
     def _internal_call(
-        self, method, url, payload, params, headers=None, retries=0, check_202=False
+        self,
+        method,
+        url,
+        payload,
+        params,
+        headers=None,
+        retries=0,
+        check_202=False,
+        attempt=0,
+        raw=False,
     ):
         logger.debug(url)
         if payload and not isinstance(payload, (bytes, str)):
-            payload = json.dumps(payload)
+            payload = codec.dumps(payload)
+        params = {k: v for k, v in params.items() if v is not None}
+
+        cache_key = cached = None
+        policy = cache_policy(url) if method == "GET" else None
+        if policy and policy.cache:
+            self.ensure_response_cache()
+            cache_key = self._get_cache_key(url, params, payload)
+            if policy.negative and cache_key in negative_cache:
+                trace.annotate(status=404, cache="negative")
+                raise SpotifyNotFoundException(status_code=404, url=url)
+            cached = self.response_cache.get(cache_key)
+
+        self.rate_limiter.acquire()
         r = self.session.request(
             method,
             url,
             proxies=self.proxies,
             timeout=self.requests_timeout,
-            headers={"Content-Type": "application/json", **(headers or {})},
+            headers={
+                "Content-Type": "application/json",
+                **({"If-None-Match": cached[0]} if cached else {}),
+                **(headers or {}),
+            },
             data=payload,
-            params={k: v for k, v in params.items() if v is not None},
+            params=params,
             client_id=self.client_id,
             client_secret=self.client_secret,
         )
-        logger.debug("HTTP Status Code: {r.status_code}")
+        if self.recorder is not None:
+            self.recorder.record(
+                method,
+                url,
+                params,
+                r.status_code,
+                r.headers,
+                r.content,
+                cached[0] if cached else None,
+            )
+        logger.debug("HTTP Status Code: %s", r.status_code)
         logger.debug("%s: %s", method, r.url)
         if payload and not isinstance(payload, bytes):
             logger.debug("DATA: %s", payload)
+        if trace.CURRENT_SPAN.get() is not None:
+            trace.annotate(
+                status=r.status_code,
+                bytes=len(r.content),
+                cache=(
+                    ("hit" if r.status_code == 304 else "miss") if cache_key else None
+                ),
+            )
+
+        if cached and r.status_code == 304:
+            logger.info("Cache hit: %s", cache_key)
+            if self.user_id:
+                self._increment_api_call_count()
+            return self._make_result(url, cached[1], raw)
 
         if check_202 and r.status_code == 202:
             if retries > 0:
@@ -108,8 +251,9 @@ class SpotifyClient(AuthMixin, EmailMixin):
                     "Device is temporarily unavailable. Retrying in 5 seconds..."
                 )
                 sleep(5)
+                trace.record_retry()
                 return self._internal_call(
-                    method, url, payload, params, headers, retries=retries - 1
+                    method, url, payload, params, headers, retries=retries - 1, raw=raw
                 )
 
             exception_params = self.get_exception_params(r)
@@ -117,19 +261,52 @@ class SpotifyClient(AuthMixin, EmailMixin):
 
         try:
             self._check_response(r)
+        except SpotifyNotFoundException:
+            if cache_key and policy.negative:
+                negative_cache.add(cache_key)
+            raise
         except SpotifyRateLimitException as exc:
-            logger.warning(
-                "Reached API rate limit. Retrying in %s seconds...", exc.retry_after
+            if attempt >= get_max_retries():
+                raise
+
+            if r.status_code == 429:
+                retry_after = exc.retry_after
+                if retry_after is None:
+                    retry_after = backoff_delay(attempt)
+                logger.warning(
+                    "Reached API rate limit. Retrying in %s seconds...", retry_after
+                )
+                self.rate_limiter.block(retry_after)
+            else:
+                delay = backoff_delay(attempt)
+                logger.warning(
+                    "Server error %s. Retrying in %.1f seconds...", r.status_code, delay
+                )
+                sleep(delay)
+            trace.record_retry()
+            return self._internal_call(
+                method,
+                url,
+                payload,
+                params,
+                headers,
+                retries,
+                check_202,
+                attempt=attempt + 1,
+                raw=raw,
             )
-            sleep(exc.retry_after)
-            return self._internal_call(method, url, payload, params)
 
         if self.user_id:
             self._increment_api_call_count()
-        if r.text and r.text != "null":
-            results = r.json()
-            logger.debug("RESP: %s", r.text)
-            return SpotifyResult(results, _client=self)
+        if r.content and r.content != b"null":
+            if raw == "bytes":
+                return r.content
+
+            results = codec.loads(r.content)
+            etag = r.headers.get("ETag")
+            if cache_key and etag:
+                trace.annotate(stored=self.response_cache.set(cache_key, etag, results))
+            return self._make_result(url, results, raw)
 
         return None
 
@@ -139,6 +316,7 @@ class SpotifyClient(AuthMixin, EmailMixin):
 
         retries = kwargs.pop("retries", 0)
         check_202 = kwargs.pop("check_202", False)
+        raw = kwargs.pop("raw", False)
         if args:
             kwargs.update(args)
 
@@ -149,10 +327,22 @@ class SpotifyClient(AuthMixin, EmailMixin):
                 logger.exception(e)
 
         if not url.startswith("http"):
-            url = API.PREFIX.value + url
-        return self._internal_call(
-            method, url, payload, kwargs, headers, retries, check_202
-        )
+            url = self.api_prefix + url
+        span = trace.start_span(method, url)
+        try:
+            return self._internal_call(
+                method, url, payload, kwargs, headers, retries, check_202, raw=raw
+            )
+        except SpotifyException as exc:
+            if kwargs.get("device_id") and (
+                isinstance(exc, SpotifyDeviceUnavailableException)
+                or exc.http_status_code == 404
+            ):
+                self.device_registry.invalidate()
+            raise
+        finally:
+            if span:
+                span.finish()
 
     def _get(self, url, args=None, payload=None, **kwargs):
         return self._api_call("GET", url, args, payload, **kwargs)
@@ -166,6 +356,53 @@ class SpotifyClient(AuthMixin, EmailMixin):
     def _put(self, url, args=None, payload=None, **kwargs):
         return self._api_call("PUT", url, args, payload, **kwargs)
 
+    def _get_in_batches(self, url, ids, batch_size, key=None, **kwargs):
+        """GET ``url`` for ``ids`` split in batches of at most ``batch_size``
+
+        Batches are fetched concurrently on the shared executor and merged back
+        in input order, either as the ``key`` list of a single result or as a
+        flat list for endpoints that respond with a JSON array.
+
+        Entities returned as null by catalog endpoints are kept in the negative
+        cache for a while and their ids are not requested again until it
+        expires.
+        """
+        raw = kwargs.pop("raw", False)
+        kwargs["raw"] = bool(raw)
+        negative = key is not None and cache_policy(url).negative
+        lookup_ids = ids
+        if negative:
+            lookup_ids = [
+                i for i in dict.fromkeys(ids) if f"{url}:{i}" not in negative_cache
+            ]
+        batches = [
+            lookup_ids[i : i + batch_size]
+            for i in range(0, len(lookup_ids), batch_size)
+        ]
+        if len(batches) > 1:
+            results = get_executor().map(
+                lambda batch: self._get(url, ids=",".join(batch), **kwargs), batches
+            )
+        else:
+            results = [
+                self._get(url, ids=",".join(batch), **kwargs) for batch in batches
+            ]
+
+        if key is None:
+            items = list(chain.from_iterable(r or [] for r in results))
+            return codec.dumpb(items) if raw == "bytes" else items
+
+        entities = {}
+        for batch, result in zip(batches, results):
+            # Match by position, relinked tracks come back with a different id
+            entities.update(zip(batch, unwrap((result or {}).get(key)) or []))
+        for _id, entity in entities.items():
+            if negative and entity is None:
+                negative_cache.add(f"{url}:{_id}")
+
+        items = [entities.get(i) for i in ids]
+        return self._make_result(url, {key: items}, raw)
+
     def previous(self, result, **kwargs):
         """returns the previous result given a paged result
 
@@ -194,9 +431,9 @@ class SpotifyClient(AuthMixin, EmailMixin):
             - tracks - a list of spotify URIs, URLs or IDs
             - market - an ISO 3166-1 alpha-2 country code.
         """
-        track_list = map(self._get_track_id, tracks)
-        return self._get(
-            API.TRACKS.value, ids=",".join(track_list), market=market, **kwargs
+        track_list = [self._get_track_id(t) for t in tracks]
+        return self._get_in_batches(
+            API.TRACKS.value, track_list, 50, key="tracks", market=market, **kwargs
         )
 
     def artist(self, artist_id, **kwargs):
@@ -215,8 +452,10 @@ class SpotifyClient(AuthMixin, EmailMixin):
         Parameters:
             - artists - a list of  artist IDs, URIs or URLs
         """
-        artist_list = map(self._get_artist_id, artists)
-        return self._get(API.ARTISTS.value, ids=",".join(artist_list), **kwargs)
+        artist_list = [self._get_artist_id(a) for a in artists]
+        return self._get_in_batches(
+            API.ARTISTS.value, artist_list, 50, key="artists", **kwargs
+        )
 
     def artist_albums(
         self, artist_id, album_type=None, country=None, limit=20, offset=0, **kwargs
@@ -297,8 +536,10 @@ class SpotifyClient(AuthMixin, EmailMixin):
         Parameters:
             - albums - a list of  album IDs, URIs or URLs
         """
-        album_list = map(self._get_album_id, albums)
-        return self._get(API.ALBUMS.value, ids=",".join(album_list), **kwargs)
+        album_list = [self._get_album_id(a) for a in albums]
+        return self._get_in_batches(
+            API.ALBUMS.value, album_list, 20, key="albums", **kwargs
+        )
 
     def search(self, url, q, limit=10, offset=0, market="from_token", **kwargs):
         """searches for an item
@@ -788,8 +1029,10 @@ class SpotifyClient(AuthMixin, EmailMixin):
         """
         track_list = []
         if tracks is not None:
-            track_list = map(self._get_track_id, tracks)
-        return self._get(API.MY_TRACKS_CONTAINS.value, ",".join(track_list), **kwargs)
+            track_list = [self._get_track_id(t) for t in tracks]
+        return self._get_in_batches(
+            API.MY_TRACKS_CONTAINS.value, track_list, 50, **kwargs
+        )
 
     def current_user_saved_tracks_add(self, tracks=None, **kwargs):
         """Add one or more tracks to the current user's
@@ -1047,22 +1290,47 @@ class SpotifyClient(AuthMixin, EmailMixin):
         cached_tracks = []
         if with_cache:
             with db_session:
-                cached_tracks = select(a for a in AudioFeatures if a.id in tracks)[:]
+                cached_tracks = AudioFeatures.select_by_sql(
+                    SQL.audio_features_by_ids,
+                    globals={},
+                    locals={"ids": json.dumps(tracks)},
+                )
                 tracks = list(set(tracks) - {a.id for a in cached_tracks})
-        batches = [tracks[i : i + 100] for i in range(0, len(tracks), 100)]
-        audio_features = [
-            self._get(API.AUDIO_FEATURES_MULTIPLE.value, ids=",".join(t), **kwargs)
-            for t in batches
-        ]
+        kwargs["raw"] = True
+        audio_features = self._get_in_batches(
+            API.AUDIO_FEATURES_MULTIPLE.value,
+            tracks,
+            100,
+            key="audio_features",
+            **kwargs,
+        )
+        audio_features = [f for f in audio_features["audio_features"] if f]
+        if not audio_features:
+            return cached_tracks
+
         with db_session:
-            audio_features = [
-                AudioFeatures.from_dict(t) for t in chain.from_iterable(audio_features)
-            ] + cached_tracks
-        return audio_features
+            db.execute(
+                SQL.insert_audio_features,
+                globals={},
+                locals={"rows": json.dumps(audio_features)},
+            )
+            audio_features = AudioFeatures.select_by_sql(
+                SQL.audio_features_by_ids,
+                globals={},
+                locals={"ids": json.dumps([f["id"] for f in audio_features])},
+            )
+        return audio_features + cached_tracks
+
+    @property
+    def device_registry(self):
+        return get_device_registry(self.user_id)
 
     def devices(self, **kwargs):
         """Get a list of user's available devices."""
-        return self._get(API.DEVICES.value, check_202=True, **kwargs)
+        result = self._get(API.DEVICES.value, check_202=True, **kwargs)
+        if result:
+            self.device_registry.update(result.devices)
+        return result
 
     def get_device_id(self, device=None):
         if isinstance(device, (str, bytes)) and DEVICE_ID_RE.match(device):
@@ -1070,36 +1338,47 @@ class SpotifyClient(AuthMixin, EmailMixin):
 
         return self.get_device(device).id
 
-    def get_device(self, device=None, only_active=True):
+    def get_device(self, device=None, only_active=True, refresh=False):
         """Get Spotify device based on name
 
+        Devices are looked up in the user's device registry and only fetched
+        again when the registry expired or the device can't be found in it.
+
         :param str, optional device: device name or ID
-        :param str, optional field: device attribute to return
+        :param bool, optional refresh: fetch the devices even if the registry is fresh
 
         str or dict: Spotify device
         """
-        devices = self.devices().devices
-        device_names = ", ".join([d.name for d in devices])
+        registry = self.device_registry
+        refreshed = refresh or not registry.fresh
+        if refreshed:
+            self.devices()
+
         device_name_or_id = device
         if not device_name_or_id:
-            if only_active:
-                device = first(devices, key=attrgetter("is_active"))
-                if not device:
-                    raise ValueError(
-                        f"""
+            device = first(registry.devices, key=attrgetter("is_active"))
+            if not (device or only_active):
+                device = first(registry.devices)
+        else:
+            device = registry.get(device_name_or_id)
+
+        if not device and not refreshed:
+            return self.get_device(device_name_or_id, only_active, refresh=True)
+
+        device_names = ", ".join([d.name for d in registry.devices])
+        if not device_name_or_id and only_active and not device:
+            raise ValueError(
+                f"""
             There's no active device.
             Possible devices: {device_names}"""
-                    )
-            else:
-                device = first(devices, key=attrgetter("is_active")) or first(devices)
-        else:
-            device = first(devices, key=lambda d: device_name_or_id in (d.name, d.id))
-            if not device:
-                raise ValueError(
-                    f"""
+            )
+
+        if device_name_or_id and not device:
+            raise ValueError(
+                f"""
         Device {device_name_or_id} doesn't exist.
         Possible devices: {device_names}"""
-                )
+            )
 
         return device
 
@@ -1141,7 +1420,9 @@ class SpotifyClient(AuthMixin, EmailMixin):
         """
         device_id = self.get_device_id(device)
         data = {"device_ids": [device_id], "play": force_play}
-        return self._put(API.PLAYER.value, payload=data, check_202=True, **kwargs)
+        result = self._put(API.PLAYER.value, payload=data, check_202=True, **kwargs)
+        self.device_registry.set_active(device_id)
+        return result
 
     def start_playback(
         self,
@@ -1252,13 +1533,15 @@ class SpotifyClient(AuthMixin, EmailMixin):
             return device.volume_percent
 
         assert 0 <= volume_percent <= 100
-        return self._put(
+        result = self._put(
             API.VOLUME.value,
             volume_percent=volume_percent,
             device_id=device.id,
             check_202=True,
             **kwargs,
         )
+        self.device_registry.update_state(device.id, volume_percent=volume_percent)
+        return result
 
     def shuffle(self, state, device=None, **kwargs):
         """Toggle playback shuffling.
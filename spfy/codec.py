@@ -0,0 +1,48 @@
+import json
+
+import ujson
+
+from . import config, logger
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# pylint: disable=too-few-public-methods
+class Codec:
+    """JSON encoder/decoder used for API request and response bodies
+
+    ``loads`` accepts bytes or str, ``dumps`` returns str and ``dumpb`` bytes.
+    """
+
+    def __init__(self, name, loads, dumps, dumpb=None):
+        self.name = name
+        self.loads = loads
+        self.dumps = dumps
+        self.dumpb = dumpb or (lambda obj: dumps(obj).encode())
+
+    def __repr__(self):
+        return f"<Codec {self.name}>"
+
+
+CODECS = {
+    "json": Codec("json", json.loads, lambda obj: json.dumps(obj, ensure_ascii=False)),
+    "ujson": Codec("ujson", ujson.loads, ujson.dumps),
+}
+if orjson is not None:
+    CODECS["orjson"] = Codec(
+        "orjson", orjson.loads, lambda obj: orjson.dumps(obj).decode(), orjson.dumps
+    )
+
+
+def get_codec(name=None):
+    name = name or config.http.codec or "ujson"
+    if name not in CODECS:
+        logger.warning("JSON codec %s is not available, using ujson", name)
+        return CODECS["ujson"]
+    return CODECS[name]
+
+
+codec = get_codec()
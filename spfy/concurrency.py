@@ -0,0 +1,184 @@
+import asyncio
+import threading
+import time
+from collections import deque
+
+from . import config
+
+
+# pylint: disable=too-many-instance-attributes
+class ConcurrencyController:
+    """Adaptive limit of in-flight requests shared by every fan-out of an app.
+
+    The limit grows additively (by ``increase`` per limit's worth of healthy
+    responses, so about one step per round of requests) while latency stays
+    within ``latency_tolerance`` times the best latency seen so far. It is cut
+    multiplicatively by ``decrease`` on 429s, 5xx responses and rising
+    latency, at most once per ``cooldown`` seconds so that a burst of errors
+    from the same round only counts once.
+
+    Fan-outs run their coroutines through :meth:`run`, which takes one of
+    the ``limit`` in-flight slots shared by every fan-out using the
+    controller, so the limit bounds their total concurrency.
+    """
+
+    def __init__(
+        self,
+        initial=None,
+        minimum=None,
+        maximum=None,
+        increase=None,
+        decrease=None,
+        latency_tolerance=None,
+        smoothing=None,
+        cooldown=None,
+    ):
+        cfg = config.http.concurrency
+        self.minimum = minimum or cfg.min or 1
+        self.maximum = maximum or cfg.max or config.http.concurrent_connections or 200
+        self.increase = increase or cfg.increase or 1
+        self.decrease = decrease or cfg.decrease or 0.5
+        self.latency_tolerance = latency_tolerance or cfg.latency_tolerance or 2.0
+        self.smoothing = smoothing or cfg.smoothing or 0.2
+        self.cooldown = cooldown if cooldown is not None else cfg.cooldown or 1.0
+        self.lock = threading.Lock()
+        self._limit = float(
+            min(self.maximum, max(self.minimum, initial or cfg.initial or 20))
+        )
+        self.in_flight = 0
+        self.waiters = deque()
+        self.latency = None
+        self.baseline = None
+        self.decreased_at = 0.0
+        self.increases = 0
+        self.decreases = 0
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    def record(self, latency):
+        """Account for a healthy response that took ``latency`` seconds"""
+        with self.lock:
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency += self.smoothing * (latency - self.latency)
+
+            if self.baseline is None or self.latency < self.baseline:
+                self.baseline = self.latency
+            elif self.latency > self.baseline * self.latency_tolerance:
+                self._decrease()
+                return
+
+            if self._limit < self.maximum:
+                self._limit = min(
+                    self.maximum, self._limit + self.increase / self._limit
+                )
+                self.increases += 1
+                self._wake_waiters()
+
+    async def acquire(self):
+        """Wait for a free in-flight slot"""
+        while True:
+            with self.lock:
+                if self.in_flight < self.limit:
+                    self.in_flight += 1
+                    return
+                waiter = asyncio.get_event_loop().create_future()
+                self.waiters.append(waiter)
+
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                with self.lock:
+                    if waiter in self.waiters:
+                        self.waiters.remove(waiter)
+                    else:
+                        # Pass the wake up on to the next waiter
+                        self._wake_waiters()
+                raise
+
+    def release(self):
+        with self.lock:
+            self.in_flight -= 1
+            self._wake_waiters()
+
+    def _wake_waiters(self):
+        for _ in range(min(len(self.waiters), self.limit - self.in_flight)):
+            waiter = self.waiters.popleft()
+            # Waiters can belong to the event loop of another thread
+            waiter.get_loop().call_soon_threadsafe(wake_up, waiter)
+
+    async def run(self, coro):
+        """Await ``coro`` in a slot and account for its latency or overload"""
+        try:
+            await self.acquire()
+        except asyncio.CancelledError:
+            if asyncio.iscoroutine(coro):
+                coro.close()
+            raise
+
+        started_at = time.monotonic()
+        try:
+            result = await coro
+        except Exception as exc:
+            if self.is_overload(exc):
+                self.backoff()
+            raise
+        finally:
+            self.release()
+
+        self.record(time.monotonic() - started_at)
+        return result
+
+    def backoff(self):
+        """Account for a 429 or 5xx response"""
+        with self.lock:
+            self._decrease()
+
+    def _decrease(self):
+        now = time.monotonic()
+        if now - self.decreased_at < self.cooldown:
+            return
+
+        self.decreased_at = now
+        self._limit = max(self.minimum, self._limit * self.decrease)
+        self.decreases += 1
+        # Latency is measured again from the new limit, the old one was
+        # inflated by the overload
+        if self.latency is not None and self.baseline is not None:
+            self.latency = self.baseline
+
+    @staticmethod
+    def is_overload(exc):
+        """Whether ``exc`` comes from a 429 or 5xx response"""
+        status = getattr(exc, "http_status_code", None) or getattr(exc, "status", None)
+        return isinstance(status, int) and (status == 429 or 500 <= status < 600)
+
+    def stats(self):
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "latency": self.latency,
+            "baseline": self.baseline,
+            "increases": self.increases,
+            "decreases": self.decreases,
+        }
+
+
+def wake_up(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+CONTROLLERS = {}
+CONTROLLERS_LOCK = threading.Lock()
+
+
+def get_concurrency_controller(key, **kwargs):
+    """Process-wide controller for ``key``, usually the app's client_id"""
+    with CONTROLLERS_LOCK:
+        if key not in CONTROLLERS:
+            CONTROLLERS[key] = ConcurrencyController(**kwargs)
+        return CONTROLLERS[key]
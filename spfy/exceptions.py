@@ -24,7 +24,7 @@ class SpotifyException(Exception):
 
 
 class SpotifyRateLimitException(SpotifyException):
-    def __init__(self, *args, retry_after=0, **kwargs):
+    def __init__(self, *args, retry_after=None, **kwargs):
         super().__init__(*args, **kwargs)
         self.retry_after = retry_after
 
@@ -34,6 +34,11 @@ class SpotifyForbiddenException(SpotifyException):
         super().__init__(*args, **kwargs)
 
 
+class SpotifyNotFoundException(SpotifyException):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+
 class SpotifyDeviceUnavailableException(SpotifyException):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
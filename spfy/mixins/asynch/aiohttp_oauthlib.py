@@ -271,7 +271,6 @@ class OAuth2Session(aiohttp.ClientSession):
                 verify_ssl=verify_ssl,
                 proxy=proxy,
             )
-            log.debug("Prepared fetch token request body %s", body)
         elif method.upper() == "GET":
             # if method is not 'POST', switch body to querystring and GET
             req = self.get(
@@ -283,15 +282,13 @@ class OAuth2Session(aiohttp.ClientSession):
                 verify_ssl=verify_ssl,
                 proxy=proxy,
             )
-            log.debug("Prepared fetch token request querystring %s", body)
         else:
             raise ValueError("The method kwarg must be POST or GET.")
 
         async with req as resp:
             text = await resp.text()
             log.debug("Request to fetch token completed with status %s.", resp.status)
-            log.debug("Request headers were %s", resp.request_info.headers)
-            log.debug("Response headers were %s and content %s.", resp.headers, text)
+            log.debug("Response headers were %s.", resp.headers)
             log.debug(
                 "Invoking %s token response hooks.",
                 len(self.compliance_hook["access_token_response"]),
@@ -301,7 +298,7 @@ class OAuth2Session(aiohttp.ClientSession):
                 resp = hook(resp)
             self._client.parse_request_body_response(text, scope=self.scope)
             self.token = self._client.token
-            log.debug("Obtained token %s.", self.token)
+            log.debug("Obtained token.")
         return self.token
 
     def token_from_fragment(self, authorization_response):
@@ -354,7 +351,6 @@ class OAuth2Session(aiohttp.ClientSession):
         body = self._client.prepare_refresh_body(
             body=body, refresh_token=refresh_token, scope=self.scope, **kwargs
         )
-        log.debug("Prepared refresh token request body %s", body)
         if headers is None:
             headers = {
                 "Accept": "application/json",
@@ -372,7 +368,7 @@ class OAuth2Session(aiohttp.ClientSession):
         ) as resp:
             text = await resp.text()
             log.debug("Request to refresh token completed with status %s.", resp.status)
-            log.debug("Response headers were %s and content %s.", resp.headers, text)
+            log.debug("Response headers were %s.", resp.headers)
             log.debug(
                 "Invoking %s token response hooks.",
                 len(self.compliance_hook["refresh_token_response"]),
@@ -413,7 +409,7 @@ class OAuth2Session(aiohttp.ClientSession):
             for hook in self.compliance_hook["protected_request"]:
                 log.debug("Invoking hook %s.", hook)
                 url, headers, data = hook(url, headers, data)
-            log.debug("Adding token %s to request.", self.token)
+            log.debug("Adding token to request.")
             try:
                 url, headers, data = self._client.add_token(
                     url, http_method=method, body=data, headers=headers
@@ -437,9 +433,7 @@ class OAuth2Session(aiohttp.ClientSession):
                         self.auto_refresh_url, auth=auth, **kwargs
                     )
                     if self.token_updater:
-                        log.debug(
-                            "Updating token to %s using %s.", token, self.token_updater
-                        )
+                        log.debug("Updating token using %s.", self.token_updater)
                         res = self.token_updater(token)
                         if isawaitable(res):
                             await res
@@ -453,8 +447,6 @@ class OAuth2Session(aiohttp.ClientSession):
                     raise
 
         log.debug("Requesting url %s using method %s.", url, method)
-        log.debug("Supplying headers %s and data %s", headers, data)
-        log.debug("Passing through key word arguments %s.", kwargs)
         return await super()._request(method, url, headers=headers, data=data, **kwargs)
 
     def register_compliance_hook(self, hook_type, hook):
@@ -18,6 +18,7 @@ from ...constants import API, AllScopes, AuthFlow
 from ...exceptions import SpotifyCredentialsException
 from ...sql import SQL
 from .aiohttp_oauthlib import OAuth2Session
+from .connector import get_connector
 
 AUTH_HTML_FILE = root / "html" / "auth_message.html"
 CACHE_FILE = Path.home() / ".cache" / "spfy" / ".web_cache"
@@ -31,6 +32,7 @@ def run_app(loop):
     )
 
 
+# pylint: disable=too-many-instance-attributes
 class AuthMixin:
     def __init__(
         self,
@@ -40,9 +42,11 @@ class AuthMixin:
         redirect_uri=None,
         user_id=None,
         username=None,
+        token_url=None,
         **kwargs,
     ):
         super().__init__(*args, **kwargs)
+        self.token_url = token_url or API.TOKEN.value
         self.client_id = client_id or config.app.client_id
         self.client_secret = client_secret or config.app.client_secret
         self.redirect_uri = self._get_redirect_uri(redirect_uri)
@@ -63,6 +67,11 @@ class AuthMixin:
             asyncio.ensure_future(self._session.close())
         self._session = new_session
 
+    def _create_session(self, *args, **kwargs):
+        return OAuth2Session(
+            *args, connector=get_connector(self), connector_owner=False, **kwargs
+        )
+
     @staticmethod
     def _get_redirect_uri(redirect_uri):
         redirect_uri = (
@@ -125,11 +134,11 @@ class AuthMixin:
         conn = conn or await self.dbpool
 
         self.flow = AuthFlow.AUTHORIZATION_CODE
-        self.session = OAuth2Session(
+        self.session = self._create_session(
             self.client_id,
             redirect_uri=self.redirect_uri,
             scope=scope,
-            auto_refresh_url=API.TOKEN.value,
+            auto_refresh_url=self.token_url,
         )
         if self.user_id:
             user = await self.fetch_user()
@@ -149,7 +158,7 @@ class AuthMixin:
 
         if code or auth_response:
             token = await self.session.fetch_token(
-                token_url=API.TOKEN.value,
+                token_url=self.token_url,
                 client_id=self.client_id,
                 client_secret=self.client_secret,
                 code=code,
@@ -229,13 +238,15 @@ class AuthMixin:
 
         self.user_id = default_user.id
         self.username = default_user.username
-        self.session = OAuth2Session(client=BackendApplicationClient(self.client_id))
+        self.session = self._create_session(
+            client=BackendApplicationClient(self.client_id)
+        )
         self.session.token_updater = self.update_user_token
         if default_user.token:
             self.session.token = default_user.token
         else:
             default_user.token = await self.session.fetch_token(
-                token_url=API.TOKEN.value,
+                token_url=self.token_url,
                 client_id=self.client_id,
                 client_secret=self.client_secret,
             )
@@ -251,11 +262,11 @@ class AuthMixin:
         scope=AllScopes,
     ):
         self.flow = AuthFlow.AUTHORIZATION_CODE
-        self.session = OAuth2Session(
+        self.session = self._create_session(
             self.client_id,
             redirect_uri=self.redirect_uri,
             scope=scope,
-            auto_refresh_url=API.TOKEN.value,
+            auto_refresh_url=self.token_url,
         )
         with db_session:
             if self.user_id:
@@ -279,7 +290,7 @@ class AuthMixin:
 
             if code or auth_response:
                 token = await self.session.fetch_token(
-                    token_url=API.TOKEN.value,
+                    token_url=self.token_url,
                     client_id=self.client_id,
                     client_secret=self.client_secret,
                     code=code,
@@ -322,13 +333,15 @@ class AuthMixin:
         default_user = User.default()
         self.user_id = default_user.id
         self.username = default_user.username
-        self.session = OAuth2Session(client=BackendApplicationClient(self.client_id))
+        self.session = self._create_session(
+            client=BackendApplicationClient(self.client_id)
+        )
         self.session.token_updater = User.token_updater(default_user.id)
         if default_user.token:
             self.session.token = default_user.token
         else:
             default_user.token = await self.session.fetch_token(
-                token_url=API.TOKEN.value,
+                token_url=self.token_url,
                 client_id=self.client_id,
                 client_secret=self.client_secret,
             )
@@ -0,0 +1,89 @@
+import asyncio
+import weakref
+
+import aiohttp
+
+from ... import config, logger
+from ...constants import API
+
+
+# pylint: disable=too-few-public-methods
+class SharedConnector:
+    __slots__ = ("connector", "users")
+
+    def __init__(self, connector):
+        self.connector = connector
+        self.users = weakref.WeakSet()
+
+
+# One connector per event loop, since a connector can't be used from another
+CONNECTORS = weakref.WeakKeyDictionary()
+
+
+def get_connector(user=None):
+    """TCP connector shared by every OAuth2Session of the running event loop.
+
+    Sessions are replaced on each authentication, so keeping the pool here
+    lets new sessions reuse open keep-alive connections and cached DNS
+    entries instead of paying for a new TLS handshake. Clients register as
+    ``user`` and the connector is closed when the last one releases it with
+    :func:`release_connector`.
+    """
+    loop = asyncio.get_event_loop()
+    shared = CONNECTORS.get(loop)
+    if shared is None or shared.connector.closed:
+        shared = CONNECTORS[loop] = SharedConnector(
+            aiohttp.TCPConnector(
+                limit=config.http.connector.limit or 100,
+                limit_per_host=config.http.connections or 30,
+                keepalive_timeout=config.http.connector.keepalive_timeout or 30,
+                ttl_dns_cache=config.http.connector.ttl_dns_cache or 300,
+            )
+        )
+        if config.http.connector.warm_up:
+            asyncio.ensure_future(
+                warm_up(shared.connector, config.http.connector.warm_up)
+            )
+    if user is not None:
+        shared.users.add(user)
+    return shared.connector
+
+
+async def warm_up(connector, connections=1, url=API.PREFIX.value):
+    """Open ``connections`` keep-alive connections to the API in advance"""
+
+    async def connect(session):
+        async with session.head(url) as resp:
+            await resp.read()
+
+    async with aiohttp.ClientSession(
+        connector=connector, connector_owner=False
+    ) as session:
+        results = await asyncio.gather(
+            *[connect(session) for _ in range(connections)], return_exceptions=True
+        )
+
+    errors = [r for r in results if isinstance(r, Exception)]
+    if errors:
+        logger.warning("Could not warm up API connections: %s", errors[0])
+    else:
+        logger.debug("Opened %d API connections", connections)
+
+
+async def release_connector(user):
+    """Stop sharing the connector with ``user``, closing it if nobody else uses it"""
+    loop = asyncio.get_event_loop()
+    shared = CONNECTORS.get(loop)
+    if shared is None:
+        return
+
+    shared.users.discard(user)
+    if not shared.users:
+        await close_connector()
+
+
+async def close_connector():
+    """Close the connector of the running event loop, even if it is still used"""
+    shared = CONNECTORS.pop(asyncio.get_event_loop(), None)
+    if shared is not None and not shared.connector.closed:
+        await shared.connector.close()
@@ -14,6 +14,7 @@ from unsplash.errors import UnsplashConnectionError, UnsplashError
 from ... import logger
 from ...asynch import LimitedAsCompletedError, limited_as_completed
 from ...cache import Artist, City, Country, Genre, ImageMixin, Playlist, format_param
+from ...concurrency import get_concurrency_controller
 from ...constants import TimeRange
 from ...sql import SQL
 from ...util import normalize_features
@@ -145,7 +146,7 @@ class RecommenderMixin:
     async def _upsert_images(self, reqs, conn=None, initial_reqs=None):
         conn = conn or await self.dbpool
 
-        concurrency_limit = 100
+        concurrency = get_concurrency_controller("unsplash", maximum=100)
         # pylint: disable=isinstance-second-argument-not-valid-type
         if not isinstance(reqs, Iterator):
             reqs_iterator = (fetch() for fetch in reqs)
@@ -155,7 +156,7 @@ class RecommenderMixin:
         try:
             async for resp in limited_as_completed(
                 reqs_iterator,
-                concurrency_limit,
+                concurrency,
                 ignore_exceptions=(UnsplashError, UnsplashConnectionError),
             ):
                 if not resp:
@@ -177,7 +178,7 @@ class RecommenderMixin:
                     except:
                         pass
 
-            remaining = len(list(reqs_iterator)) + concurrency_limit
+            remaining = len(list(reqs_iterator)) + len(exc.remaining_futures) + 1
             initial_reqs = initial_reqs or reqs
 
             if exc.original_exc:
@@ -1,14 +1,12 @@
 import socket
 import threading
 import uuid
-from pathlib import Path
 from wsgiref.simple_server import make_server
 
 import hug
-from cachecontrol import CacheControlAdapter
-from cachecontrol.caches.file_cache import FileCache
 from oauthlib.oauth2 import BackendApplicationClient
 from pony.orm import get
+from requests.adapters import HTTPAdapter
 from requests_oauthlib import OAuth2Session
 
 from .. import config, logger, root
@@ -17,7 +15,6 @@ from ..constants import API, AllScopes, AuthFlow
 from ..exceptions import SpotifyCredentialsException
 
 AUTH_HTML_FILE = root / "html" / "auth_message.html"
-CACHE_FILE = Path.home() / ".cache" / "spfy" / ".web_cache"
 
 
 class AuthMixin:
@@ -29,9 +26,11 @@ class AuthMixin:
         redirect_uri=None,
         user_id=None,
         username=None,
+        token_url=None,
         **kwargs,
     ):
         super().__init__(*args, **kwargs)
+        self.token_url = token_url or API.TOKEN.value
         self.client_id = client_id or config.app.client_id
         self.client_secret = client_secret or config.app.client_secret
         self.redirect_uri = self._get_redirect_uri(redirect_uri)
@@ -55,13 +54,13 @@ class AuthMixin:
     @staticmethod
     def get_session(*args, **kwargs):
         session = OAuth2Session(*args, **kwargs)
-        cache_adapter = CacheControlAdapter(
-            cache=FileCache(CACHE_FILE),
+        adapter = HTTPAdapter(
             pool_connections=config.http.connections,
             pool_maxsize=config.http.connections,
             max_retries=config.http.retries,
         )
-        session.mount("http://", cache_adapter)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
         return session
 
     @property
@@ -88,7 +87,7 @@ class AuthMixin:
             self.client_id,
             redirect_uri=self.redirect_uri,
             scope=scope,
-            auto_refresh_url=API.TOKEN.value,
+            auto_refresh_url=self.token_url,
         )
         if self.user_id:
             user = User.get(id=self.user_id)
@@ -108,7 +107,7 @@ class AuthMixin:
 
         if code or auth_response:
             token = session.fetch_token(
-                token_url=API.TOKEN.value,
+                token_url=self.token_url,
                 client_id=self.client_id,
                 client_secret=self.client_secret,
                 code=code,
@@ -158,7 +157,7 @@ class AuthMixin:
             session.token = default_user.token
         else:
             default_user.token = session.fetch_token(
-                token_url=API.TOKEN.value,
+                token_url=self.token_url,
                 client_id=self.client_id,
                 client_secret=self.client_secret,
             )
@@ -0,0 +1,344 @@
+import inspect
+from collections.abc import Sequence
+from functools import lru_cache
+
+from .constants import API
+from .trace import endpoint_template
+
+ITER_KEYS = (
+    "items",
+    "artists",
+    "tracks",
+    "albums",
+    "audio_features",
+    "playlists",
+    "devices",
+)
+
+
+def wrap(value, model=None, client=None):
+    if isinstance(value, dict):
+        return (model or Model)(value, _client=client)
+
+    if isinstance(value, list):
+        return ModelList(value, model, client)
+
+    return value
+
+
+def unwrap(value):
+    if isinstance(value, (Model, ModelList)):
+        return value._data
+
+    if isinstance(value, list):
+        return [unwrap(v) for v in value]
+
+    return value
+
+
+class ModelList(Sequence):
+    """List view that wraps its elements only when they are accessed"""
+
+    __slots__ = ("_data", "_model", "_client")
+
+    def __init__(self, data, model=None, client=None):
+        self._data = data
+        self._model = model
+        self._client = client
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return ModelList(self._data[index], self._model, self._client)
+        return wrap(self._data[index], self._model, self._client)
+
+    def __setitem__(self, index, value):
+        self._data[index] = unwrap(value)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __iter__(self):
+        model, client = self._model, self._client
+        for value in self._data:
+            yield wrap(value, model, client)
+
+    def __eq__(self, other):
+        if isinstance(other, ModelList):
+            other = other._data
+        return self._data == other
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+    def __repr__(self):
+        return f"ModelList({self._data!r})"
+
+    def append(self, value):
+        self._data.append(unwrap(value))
+
+    def extend(self, values):
+        self._data.extend(unwrap(v) for v in values)
+
+    def to_list(self):
+        return self._data
+
+
+class Model:
+    """Attribute view over a decoded JSON object.
+
+    Nothing is converted up front: nested objects are wrapped in the model
+    given by ``FIELDS`` (or a plain :class:`Model`) when they are accessed, and
+    writes go straight to the underlying dict. Like with ``SpotifyResult``, a
+    missing attribute is an empty model, so ``track.album.images`` works on
+    partial objects, while indexing a missing key raises KeyError. Iterating
+    or indexing with an int goes through the items under the first of
+    ``ITER_KEYS`` (or its ``items`` on paging objects) and falls back to the
+    keys, the same as ``SpotifyResult``.
+
+    Paging and playback go through the ``SpotifyResult`` of the client that
+    made the request, with the items wrapped in their model.
+    """
+
+    __slots__ = ("_data", "_client")
+    FIELDS = {}
+
+    def __init__(self, data=None, _client=None, **kwargs):
+        object.__setattr__(self, "_data", {} if data is None else data)
+        object.__setattr__(self, "_client", _client)
+        if kwargs:
+            self._data.update(kwargs)
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+
+        model = self.FIELDS.get(name)
+        if name not in self._data:
+            return (model or Model)(_client=self._client)
+        return wrap(self._data[name], model, self._client)
+
+    def __setattr__(self, name, value):
+        self._data[name] = unwrap(value)
+
+    def __delattr__(self, name):
+        del self._data[name]
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            items = self.paged_items()
+            if items is not None:
+                return items[key]
+
+        return wrap(self._data[key], self.FIELDS.get(key), self._client)
+
+    def __setitem__(self, key, value):
+        self._data[key] = unwrap(value)
+
+    def __delitem__(self, key):
+        del self._data[key]
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __iter__(self):
+        items = self.paged_items()
+        if items is not None:
+            return iter(items)
+
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __bool__(self):
+        return bool(self._data)
+
+    def __eq__(self, other):
+        if isinstance(other, Model):
+            other = other._data
+        return self._data == other
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self._data!r})"
+
+    def get(self, key, default=None):
+        if key in self._data:
+            return self[key]
+        return default
+
+    def keys(self):
+        return self._data.keys()
+
+    def values(self):
+        return [self[k] for k in self._data]
+
+    def items(self):
+        return [(k, self[k]) for k in self._data]
+
+    def update(self, *args, **kwargs):
+        self._data.update(*args, **kwargs)
+
+    def to_dict(self):
+        return self._data
+
+    def to_result(self):
+        """The same object as a ``SpotifyResult`` of the client that fetched it"""
+        return self._client.result_class(self._data, _client=self._client)
+
+    def paged_items(self):
+        """Items under the first of ``ITER_KEYS``, wrapped in their model"""
+        for key in ITER_KEYS:
+            if key in self._data:
+                value = self[key]
+                if isinstance(value, Model) and "items" in value:
+                    return value["items"]
+                return value
+
+        return None
+
+    def item_model(self):
+        """Model of the items that iterating the ``SpotifyResult`` yields"""
+        for key in ITER_KEYS:
+            if key in self._data:
+                model = self.FIELDS.get(key)
+                if isinstance(self._data[key], dict) and "items" in self._data[key]:
+                    return model.FIELDS.get("items") if model else None
+                return model
+
+        return None
+
+    def all(self, limit=None, **kwargs):
+        items = self.to_result().all(limit, raw=True, **kwargs)
+        if inspect.isawaitable(items):
+            return wrap_all(items, self.item_model(), self._client)
+        return ModelList(list(items), self.item_model(), self._client)
+
+    def iterall(self, limit=None, **kwargs):
+        items = self.to_result().iterall(limit=limit, raw=True, **kwargs)
+        model, client = self.item_model(), self._client
+        if hasattr(items, "__aiter__"):
+            return wrap_aiter(items, model, client)
+        return (wrap(item, model, client) for item in items)
+
+    def play(self, device=None, index=None):
+        return self.to_result().play(device, index)
+
+
+async def wrap_all(items, model, client):
+    return ModelList(await items, model, client)
+
+
+async def wrap_aiter(items, model, client):
+    async for item in items:
+        yield wrap(item, model, client)
+
+
+@lru_cache(maxsize=None)
+def paging(model):
+    """Model of a paging object whose ``items`` are ``model``"""
+    return type(
+        f"{model.__name__}Paging",
+        (Model,),
+        {"__slots__": (), "FIELDS": {"items": model}},
+    )
+
+
+@lru_cache(maxsize=None)
+def collection(key, model):
+    """Model of an object holding a list of ``model`` under ``key``"""
+    return type(
+        f"{model.__name__}Collection",
+        (Model,),
+        {"__slots__": (), "FIELDS": {key: model}},
+    )
+
+
+class Image(Model):
+    __slots__ = ()
+
+
+class Artist(Model):
+    __slots__ = ()
+    FIELDS = {"images": Image}
+
+
+class Album(Model):
+    __slots__ = ()
+
+
+class Track(Model):
+    __slots__ = ()
+    FIELDS = {"album": Album, "artists": Artist}
+
+
+# Albums and tracks reference each other
+Album.FIELDS = {"artists": Artist, "images": Image, "tracks": paging(Track)}
+
+
+class TrackItem(Model):
+    """A track in a playlist or in the user's library, with its ``added_at``"""
+
+    __slots__ = ()
+    FIELDS = {"track": Track}
+
+
+class Playlist(Model):
+    __slots__ = ()
+    FIELDS = {"images": Image, "tracks": paging(TrackItem)}
+
+
+class Device(Model):
+    __slots__ = ()
+
+
+class AudioFeatures(Model):
+    __slots__ = ()
+
+
+class Playback(Model):
+    __slots__ = ()
+    FIELDS = {"item": Track, "device": Device}
+
+
+class SearchResult(Model):
+    __slots__ = ()
+    FIELDS = {
+        "albums": paging(Album),
+        "artists": paging(Artist),
+        "playlists": paging(Playlist),
+        "tracks": paging(Track),
+    }
+
+
+ENDPOINT_MODELS = {
+    API.ALBUM.value: Album,
+    API.ALBUM_TRACKS.value: paging(Track),
+    API.ALBUMS.value: collection("albums", Album),
+    API.ARTIST.value: Artist,
+    API.ARTIST_ALBUMS.value: paging(Album),
+    API.ARTIST_RELATED_ARTISTS.value: collection("artists", Artist),
+    API.ARTIST_TOP_TRACKS.value: collection("tracks", Track),
+    API.ARTISTS.value: collection("artists", Artist),
+    API.AUDIO_FEATURES_SINGLE.value: AudioFeatures,
+    API.AUDIO_FEATURES_MULTIPLE.value: collection("audio_features", AudioFeatures),
+    API.CURRENTLY_PLAYING.value: Playback,
+    API.DEVICES.value: collection("devices", Device),
+    API.MY_PLAYLISTS.value: paging(Playlist),
+    API.MY_TRACKS.value: paging(TrackItem),
+    API.PLAYER.value: Playback,
+    API.PLAYLIST.value: Playlist,
+    API.PLAYLIST_TRACKS.value: paging(TrackItem),
+    API.PLAYLISTS.value: paging(Playlist),
+    API.RECENTLY_PLAYED.value: paging(TrackItem),
+    API.SEARCH_TRACK.value.split("?", maxsplit=1)[0]: SearchResult,
+    API.TRACK.value: Track,
+    API.TRACKS.value: collection("tracks", Track),
+}
+
+
+def from_response(url, results, client=None):
+    """Wrap a decoded API response in the model of the endpoint it came from"""
+    if not isinstance(results, dict):
+        return results
+
+    return ENDPOINT_MODELS.get(endpoint_template(url), Model)(results, _client=client)
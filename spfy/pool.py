@@ -0,0 +1,35 @@
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from . import config
+
+EXECUTOR = None
+EXECUTOR_LOCK = threading.Lock()
+
+
+def get_executor():
+    """Process-wide thread pool for concurrent API requests.
+
+    Bounded to ``http.parallel_connections`` workers so that fan-outs from
+    different threads share the same limit instead of each spawning their own.
+    """
+    global EXECUTOR  # pylint: disable=global-statement
+    with EXECUTOR_LOCK:
+        if EXECUTOR is None:
+            EXECUTOR = ThreadPoolExecutor(
+                max_workers=config.http.parallel_connections or 20,
+                thread_name_prefix="spfy",
+            )
+        return EXECUTOR
+
+
+def shutdown_executor(wait=True):
+    global EXECUTOR  # pylint: disable=global-statement
+    with EXECUTOR_LOCK:
+        executor, EXECUTOR = EXECUTOR, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+atexit.register(shutdown_executor)
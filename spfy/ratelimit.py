@@ -0,0 +1,98 @@
+import asyncio
+import random
+import threading
+import time
+
+from . import config
+
+
+class RateLimiter:
+    """Token bucket shared by every thread that talks to the same Spotify app.
+
+    Requests are paced to ``rate`` per second with bursts of up to ``burst``
+    requests. Pacing is off with a ``rate`` of 0, the default, since Spotify
+    doesn't publish its limits. When Spotify answers with a 429,
+    :meth:`block` holds back every caller until ``Retry-After`` (or a random
+    backoff without it) passes, each with a random jitter so they don't all
+    fire at the same instant. Async clients only wait on that
+    deadline with :meth:`wait`, their fan-outs are paced by
+    :class:`spfy.concurrency.ConcurrencyController` instead.
+    """
+
+    def __init__(self, rate=None, burst=None, jitter=None):
+        self.rate = rate if rate is not None else config.http.rate_limit.rate or 0
+        self.burst = burst or config.http.rate_limit.burst or 20
+        self.jitter = (
+            jitter if jitter is not None else config.http.rate_limit.jitter or 1.0
+        )
+        self.lock = threading.Lock()
+        self.tokens = float(self.burst)
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+
+    def reserve(self):
+        """Take a token and return the number of seconds to wait before using it"""
+        with self.lock:
+            now = time.monotonic()
+            delay = 0.0
+            if self.rate:
+                self.tokens = min(
+                    self.burst, self.tokens + (now - self.updated_at) * self.rate
+                )
+                self.updated_at = now
+                self.tokens -= 1
+                delay = max(0.0, -self.tokens / self.rate)
+            if self.blocked_until > now:
+                delay = max(
+                    delay,
+                    self.blocked_until - now + random.uniform(0, self.jitter),
+                )
+            return delay
+
+    def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    def blocked_for(self):
+        """Seconds left until the ``Retry-After`` deadline, with jitter"""
+        with self.lock:
+            now = time.monotonic()
+            if self.blocked_until <= now:
+                return 0.0
+            return self.blocked_until - now + random.uniform(0, self.jitter)
+
+    async def wait(self):
+        """Wait until the ``Retry-After`` deadline passes, even if it is extended"""
+        delay = self.blocked_for()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = self.blocked_for()
+
+    def block(self, retry_after):
+        """Hold back every request for ``retry_after`` seconds"""
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+            self.tokens = min(self.tokens, 0.0)
+
+
+def backoff_delay(attempt, maximum=10):
+    """Random exponential delay for a retry without ``Retry-After``"""
+    return random.uniform(0, min(maximum, pow(2, attempt)))
+
+
+def get_max_retries():
+    max_retries = config.http.rate_limit.get("max_retries")
+    return 5 if max_retries is None else max_retries
+
+
+RATE_LIMITERS = {}
+RATE_LIMITERS_LOCK = threading.Lock()
+
+
+def get_rate_limiter(key):
+    """Process-wide limiter for ``key``, usually the app's client_id"""
+    with RATE_LIMITERS_LOCK:
+        if key not in RATE_LIMITERS:
+            RATE_LIMITERS[key] = RateLimiter()
+        return RATE_LIMITERS[key]
@@ -0,0 +1,2 @@
+from .cassette import Cassette, request_key
+from .server import FakeSpotify, serve
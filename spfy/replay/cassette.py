@@ -0,0 +1,89 @@
+import json
+import threading
+from collections import defaultdict
+from pathlib import Path
+from urllib.parse import parse_qsl, urlparse
+
+from ..constants import API
+
+RECORDED_HEADERS = ("etag", "retry-after", "content-type", "cache-control")
+
+
+def request_key(method, url, params=None):
+    """``(method, path, query)`` used to match a request to its recordings"""
+    parsed = urlparse(url)
+    query = dict(parse_qsl(parsed.query))
+    query.update({k: str(v) for k, v in (params or {}).items() if v is not None})
+    return method.upper(), parsed.path, tuple(sorted(query.items()))
+
+
+class Cassette:
+    """Recorded API request/response pairs, stored as a JSON file
+
+    Assign one to ``client.recorder`` to record every API call the client
+    makes, then :meth:`save` it. :class:`spfy.replay.FakeSpotify` serves a
+    saved cassette back. Calls are recorded in the order they were made,
+    including 304s and 429s.
+    """
+
+    def __init__(self, filename=None, prefix=None):
+        self.filename = Path(filename) if filename else None
+        self.prefix = prefix or API.PREFIX.value
+        self.lock = threading.Lock()
+        self.interactions = []
+        if self.filename and self.filename.exists():
+            self.load()
+
+    def __len__(self):
+        return len(self.interactions)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc):
+        if self.filename:
+            self.save()
+
+    def record(self, method, url, params, status, headers, body, etag=None):
+        method, path, query = request_key(method, url, params)
+        interaction = {
+            "method": method,
+            "path": path,
+            "query": dict(query),
+            "if_none_match": etag,
+            "status": status,
+            "headers": {
+                k.lower(): v
+                for k, v in headers.items()
+                if k.lower() in RECORDED_HEADERS
+            },
+            "body": body.decode("utf-8") if body else None,
+        }
+        with self.lock:
+            self.interactions.append(interaction)
+
+    def by_request(self):
+        """Recorded interactions grouped by :func:`request_key`, in recording order"""
+        requests = defaultdict(list)
+        with self.lock:
+            for interaction in self.interactions:
+                key = (
+                    interaction["method"],
+                    interaction["path"],
+                    tuple(sorted(interaction["query"].items())),
+                )
+                requests[key].append(interaction)
+        return requests
+
+    def load(self):
+        data = json.loads(self.filename.read_text(encoding="utf-8"))
+        with self.lock:
+            self.prefix = data.get("prefix") or self.prefix
+            self.interactions = data["interactions"]
+
+    def save(self, filename=None):
+        filename = Path(filename) if filename else self.filename
+        filename.parent.mkdir(parents=True, exist_ok=True)
+        with self.lock:
+            data = {"prefix": self.prefix, "interactions": self.interactions}
+        filename.write_text(json.dumps(data, indent=2), encoding="utf-8")
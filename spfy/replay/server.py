@@ -0,0 +1,214 @@
+import asyncio
+import math
+import os
+import random
+import time
+from collections import deque
+
+import fire
+from aiohttp import web
+
+from .. import logger
+from .cassette import Cassette, request_key
+
+TOKEN_PATH = "/api/token"
+INSECURE_TRANSPORT = "OAUTHLIB_INSECURE_TRANSPORT"
+
+
+# pylint: disable=too-few-public-methods
+class WindowRateLimit:
+    """Allows ``rate`` requests in any ``window`` seconds, like Spotify does"""
+
+    def __init__(self, rate, window=30):
+        self.rate = rate
+        self.window = window
+        self.requests = deque()
+
+    def retry_after(self):
+        """Record a request and return 0, or the seconds to wait if over the limit"""
+        now = time.monotonic()
+        while self.requests and self.requests[0] <= now - self.window:
+            self.requests.popleft()
+
+        if len(self.requests) >= self.rate:
+            return self.requests[0] + self.window - now
+
+        self.requests.append(now)
+        return 0
+
+
+# pylint: disable=too-many-instance-attributes
+class FakeSpotify:
+    """Local Spotify API that replays a recorded :class:`Cassette`
+
+    Requests are matched by method, path and query. Repeated requests get the
+    recorded responses in order, and then the last one again. Conditional
+    requests are answered with a 304 when the ETag matches, and links to the
+    recorded API prefix are rewritten to point at this server. Clients
+    created with the server's URL as ``api_prefix`` also get their tokens
+    from it.
+
+    The server speaks plain HTTP, which oauthlib refuses unless
+    ``OAUTHLIB_INSECURE_TRANSPORT`` is set. :meth:`start` sets it until
+    :meth:`stop`, clients in another process have to set it themselves.
+
+    :param latency: seconds to wait before every response
+    :param jitter: up to this many seconds are randomly added to the latency
+    :param rate: answer with 429 after ``rate`` requests in ``window`` seconds
+    :param replay_errors: replay recorded 429 and 5xx responses
+    """
+
+    def __init__(
+        self,
+        cassette,
+        latency=0.0,
+        jitter=0.0,
+        rate=None,
+        window=30,
+        replay_errors=False,
+    ):
+        self.cassette = (
+            cassette if isinstance(cassette, Cassette) else Cassette(cassette)
+        )
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = WindowRateLimit(rate, window) if rate else None
+        self.replay_errors = replay_errors
+        self.requests = self._load_requests()
+        self.positions = {}
+        self.served = 0
+        self.runner = None
+        self.url = None
+        self.insecure_transport = None
+
+    def _load_requests(self):
+        requests = {}
+        for key, interactions in self.cassette.by_request().items():
+            # 304s are answered from the ETag of the recorded 200
+            interactions = [
+                i
+                for i in interactions
+                if i["status"] != 304
+                and (
+                    self.replay_errors
+                    or not (i["status"] == 429 or 500 <= i["status"] < 600)
+                )
+            ]
+            if interactions:
+                requests[key] = interactions
+        return requests
+
+    def app(self):
+        app = web.Application()
+        app.router.add_route("*", "/{path:.*}", self.handle)
+        return app
+
+    def _next_interaction(self, key):
+        interactions = self.requests.get(key)
+        if not interactions:
+            return None
+
+        position = self.positions.get(key, 0)
+        self.positions[key] = min(position + 1, len(interactions) - 1)
+        return interactions[position]
+
+    async def handle(self, request):
+        self.served += 1
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + random.uniform(0, self.jitter))
+
+        if request.path == TOKEN_PATH:
+            return web.json_response(
+                {"access_token": "fake", "token_type": "Bearer", "expires_in": 3600}
+            )
+
+        if self.rate_limit:
+            retry_after = self.rate_limit.retry_after()
+            if retry_after:
+                return web.json_response(
+                    {"error": {"status": 429, "message": "API rate limit exceeded"}},
+                    status=429,
+                    headers={"Retry-After": str(math.ceil(retry_after))},
+                )
+
+        key = request_key(request.method, str(request.url))
+        interaction = self._next_interaction(key)
+        if interaction is None:
+            logger.warning(
+                "No recorded response for %s %s", request.method, request.url
+            )
+            return web.json_response(
+                {"error": {"status": 404, "message": "Not recorded"}}, status=404
+            )
+
+        headers = dict(interaction["headers"])
+        etag = headers.get("etag")
+        if etag and request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+
+        body = interaction["body"]
+        if body:
+            body = body.replace(
+                self.cassette.prefix, f"{request.scheme}://{request.host}"
+            )
+        return web.Response(
+            status=interaction["status"],
+            text=body,
+            headers={k: v for k, v in headers.items() if k != "content-type"},
+            content_type="application/json" if body else None,
+        )
+
+    async def start(self, host="127.0.0.1", port=0):
+        """Start serving and return the URL to use as the client's ``api_prefix``"""
+        self.runner = web.AppRunner(self.app())
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        self.url = f"http://{host}:{port}"
+        self.insecure_transport = os.environ.get(INSECURE_TRANSPORT)
+        os.environ[INSECURE_TRANSPORT] = "1"
+        return self.url
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+            if self.insecure_transport is None:
+                os.environ.pop(INSECURE_TRANSPORT, None)
+            else:
+                os.environ[INSECURE_TRANSPORT] = self.insecure_transport
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *_exc):
+        await self.stop()
+
+
+def serve(
+    cassette,
+    host="127.0.0.1",
+    port=8080,
+    latency=0.0,
+    jitter=0.0,
+    rate=None,
+    window=30,
+    replay_errors=False,
+):
+    """Replay a cassette on http://host:port until interrupted
+
+    Clients need OAUTHLIB_INSECURE_TRANSPORT=1 in their environment to talk
+    to the server over plain HTTP.
+    """
+    server = FakeSpotify(cassette, latency, jitter, rate, window, replay_errors)
+    web.run_app(server.app(), host=host, port=port)
+
+
+def main():
+    fire.Fire(serve)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
+import queue
 import random
 import threading
-from concurrent.futures import ThreadPoolExecutor
-from itertools import chain
+from collections import deque
+from functools import partial
+from itertools import chain, islice
 from urllib.parse import parse_qs, urlparse, urlunparse
 
 import addict
@@ -9,8 +11,19 @@ from cached_property import cached_property
 
 from . import config
 from .constants import API
+from .pool import get_executor
 
-LOCAL_ATTRIBUTES = {"_client", "_next_result", "_next_result_available", "_playable"}
+LOCAL_ATTRIBUTES = {"_client", "_playable"}
+
+
+def to_plain(value):
+    if isinstance(value, dict):
+        return {k: to_plain(v) for k, v in value.items()}
+
+    if isinstance(value, (list, tuple)):
+        return [to_plain(v) for v in value]
+
+    return value
 
 
 class Playable:
@@ -45,6 +58,113 @@ class Playable:
         return data
 
 
+class SpotifyResultIterator:
+    """Iterates the items of a result and of the pages that follow it
+
+    Pages are requested on the shared pool from :mod:`spfy.pool`, up to
+    ``lookahead`` of them ahead of the page being consumed, and are yielded
+    in order. Offset paginated pages are requested concurrently. Cursor
+    paginated pages (followed artists, recently played) and pages without a
+    total follow their next links, so each one is requested as soon as the
+    previous one arrived and is yielded as soon as it arrives. Errors are
+    raised to the consumer when it reaches the failed page, and a page that
+    takes longer than ``http.page_timeout`` seconds raises TimeoutError.
+    """
+
+    def __init__(self, result, limit=None, raw=False, lookahead=None):
+        self.result = result
+        self.limit = limit
+        self.raw = raw
+        self.lookahead = lookahead or config.http.prefetch_pages or 2
+        self.timeout = config.http.page_timeout or 10
+
+    def __iter__(self):
+        yield from self.page_items(self.result.to_dict() if self.raw else self.result)
+
+        params_list = None
+        if self.result.cursor_paging(self.result) is None:
+            params_list = self.result.get_next_params_list(self.limit)
+        pages = self.offset_pages(params_list) if params_list else self.linked_pages()
+        for page in pages:
+            yield from self.page_items(page)
+
+    def page_items(self, page):
+        return SpotifyResult.page_items(page) if self.raw else page
+
+    def offset_pages(self, params_list):
+        executor = get_executor()
+        params_list = iter(params_list)
+        fetch = partial(self.result._get_with_params, raw=self.raw)
+        pending = deque(
+            executor.submit(fetch, params)
+            for params in islice(params_list, self.lookahead)
+        )
+        try:
+            while pending:
+                page = pending.popleft().result(timeout=self.timeout)
+                pending.extend(
+                    executor.submit(fetch, params) for params in islice(params_list, 1)
+                )
+                if page:
+                    yield page
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def linked_pages(self):
+        url = SpotifyResult.next_url(self.result)
+        if not url:
+            return
+
+        # Pages, then None once there are no more, or the error of a page
+        pages = queue.Queue()
+        lock = threading.Lock()
+        state = {"url": url, "fetching": False}
+
+        def fetch_ahead(url):
+            """Fetch pages until ``lookahead`` are waiting to be consumed"""
+            while True:
+                try:
+                    page = self.result._client._get(url, raw=self.raw)
+                    url = SpotifyResult.next_url(page) if page else None
+                except Exception as exc:  # pylint: disable=broad-except
+                    page, url = exc, None
+
+                with lock:
+                    if page is not None:
+                        pages.put(page)
+                    if not url or isinstance(page, Exception):
+                        state["url"], state["fetching"] = None, False
+                        pages.put(None)
+                        return
+                    if pages.qsize() >= self.lookahead:
+                        state["url"], state["fetching"] = url, False
+                        return
+
+        def fetch_more():
+            with lock:
+                if state["fetching"] or not state["url"]:
+                    return
+                if pages.qsize() >= self.lookahead:
+                    return
+                state["fetching"] = True
+                get_executor().submit(fetch_ahead, state["url"])
+
+        fetch_more()
+        while True:
+            try:
+                page = pages.get(timeout=self.timeout)
+            except queue.Empty:
+                raise TimeoutError(f"No page in {self.timeout} seconds") from None
+
+            if page is None:
+                return
+            if isinstance(page, Exception):
+                raise page
+            fetch_more()
+            yield page
+
+
 class SpotifyResult(addict.Dict):
     ITER_KEYS = (
         "items",
@@ -58,9 +178,6 @@ class SpotifyResult(addict.Dict):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self._next_result_available = threading.Event()
-        self._next_result = None
-        self._playable = Playable(self)
 
     def __iter__(self):
         for key in self.ITER_KEYS:
@@ -102,6 +219,13 @@ class SpotifyResult(addict.Dict):
     def values(self):
         return [v for k, v in self.items()]
 
+    def to_dict(self):
+        return to_plain(self)
+
+    @cached_property
+    def _playable(self):
+        return Playable(self)
+
     def play(self, device=None, index=None):
         return self._playable.play(device, index)
 
@@ -109,14 +233,14 @@ class SpotifyResult(addict.Dict):
     def base_url(self):
         return urlunparse([*urlparse(self.href)[:3], "", "", ""])
 
-    def _get_with_params(self, params, url=None):
-        return self._client._get(url or self.base_url, **params)
+    def _get_with_params(self, params, url=None, raw=False):
+        return self._client._get(url or self.base_url, raw=raw, **params)
 
     def _put_with_params(self, params, url=None):
         return self._client._put(url or self.base_url, **params)
 
     def get_next_params_list(self, limit=None):
-        if self["next"] and self["href"]:
+        if self["next"] and self["href"] and self["total"]:
             max_limit = limit or 50
             url = urlparse(self["href"])
             params = {k: v[0] for k, v in parse_qs(url.query).items()}
@@ -129,40 +253,75 @@ class SpotifyResult(addict.Dict):
 
         return []
 
-    def all(self, limit=None):
+    @classmethod
+    def cursor_paging(cls, page):
+        """The paging object of a cursor paginated page, or None"""
+        if "cursors" in page:
+            return page
+
+        for key in cls.ITER_KEYS:
+            if key in page and isinstance(page[key], dict) and "cursors" in page[key]:
+                return page[key]
+
+        return None
+
+    @classmethod
+    def next_url(cls, page):
+        """URL of the page after ``page``, following nested cursor paging"""
+        return (cls.cursor_paging(page) or page).get("next")
+
+    @classmethod
+    def page_items(cls, page):
+        """Items of a plain decoded page, the same ones iterating a result yields"""
+        for key in cls.ITER_KEYS:
+            if key in page:
+                if isinstance(page[key], dict) and "items" in page[key]:
+                    return page[key]["items"]
+
+                return page[key]
+
+        return []
+
+    def all(self, limit=None, raw=False):
+        """Fetch the remaining pages concurrently and return their items
+
+        :param raw: True to get the items as plain dicts, "bytes" to get the
+                    undecoded body of each page instead of items
+        """
         params_list = self.get_next_params_list(limit)
         if not params_list:
             return []
 
-        with ThreadPoolExecutor(
-            max_workers=config.http.parallel_connections
-        ) as executor:
-            return chain.from_iterable(
-                executor.map(
-                    self._get_with_params, params_list, timeout=10 * len(params_list)
-                )
-            )
+        executor = get_executor()
+        futures = [
+            executor.submit(self._get_with_params, params, raw=raw)
+            for params in params_list
+        ]
+        timeout = config.http.page_timeout or 10
+        pages = (future.result(timeout=timeout) for future in futures)
+        if raw == "bytes":
+            return list(pages)
+        if raw:
+            return chain.from_iterable(map(self.page_items, pages))
+        return chain.from_iterable(pages)
 
     @cached_property
     def next(self):
-        if self["next"]:
-            return self._client._get(self["next"])
+        url = self.next_url(self)
+        if url:
+            return self._client._get(url)
 
         return None
 
-    def _fetch_next_result(self, result):
-        self._next_result = result.next
-        self._next_result_available.set()
-
-    def iterall(self):
-        result = self
-        while result:
-            threading.Thread(target=self._fetch_next_result, args=(result,)).start()
-            for item in result:
-                yield item
-
-            if self._next_result_available.wait(10):
-                result = self._next_result
-                self._next_result_available.clear()
-            else:
-                break
+    def iterall(self, raw=False, limit=None, lookahead=None):
+        """Iterate the items of this page and the following ones
+
+        The next ``lookahead`` pages (http.prefetch_pages by default) are
+        fetched in the background while the current one is consumed.
+
+        :param raw: True to get the items as plain dicts
+        """
+        if raw == "bytes":
+            raise ValueError("iterall needs decoded pages, use all(raw='bytes')")
+
+        return iter(SpotifyResultIterator(self, limit, raw, lookahead))
@@ -85,6 +85,59 @@ SQL = addict.Dict(
             VALUES ({values})
             ON CONFLICT DO NOTHING
         """,
+        "increment_api_calls": """
+            UPDATE users AS u
+            SET api_calls = u.api_calls + v.calls,
+                last_usage_at = GREATEST(u.last_usage_at, v.last_usage_at)
+            FROM (VALUES {values}) AS v(id, calls, last_usage_at)
+            WHERE u.id = v.id
+        """
+        if POSTGRES
+        else """
+            UPDATE users
+            SET api_calls = users.api_calls + v.column2,
+                last_usage_at = MAX(users.last_usage_at, v.column3)
+            FROM (VALUES {values}) AS v
+            WHERE users.id = v.column1
+        """,
+        "insert_audio_features": """
+            INSERT INTO audio_features
+            SELECT * FROM json_populate_recordset(NULL::audio_features, CAST($rows AS json))
+            ON CONFLICT DO NOTHING
+        """
+        if POSTGRES
+        else """
+            INSERT OR IGNORE INTO audio_features (
+                id, acousticness, danceability, duration_ms, energy,
+                instrumentalness, key, liveness, loudness, mode,
+                speechiness, tempo, time_signature, valence
+            )
+            SELECT
+                json_extract(value, '$$.id'),
+                json_extract(value, '$$.acousticness'),
+                json_extract(value, '$$.danceability'),
+                json_extract(value, '$$.duration_ms'),
+                json_extract(value, '$$.energy'),
+                json_extract(value, '$$.instrumentalness'),
+                json_extract(value, '$$.key'),
+                json_extract(value, '$$.liveness'),
+                json_extract(value, '$$.loudness'),
+                json_extract(value, '$$.mode'),
+                json_extract(value, '$$.speechiness'),
+                json_extract(value, '$$.tempo'),
+                json_extract(value, '$$.time_signature'),
+                json_extract(value, '$$.valence')
+            FROM json_each($rows)
+        """,
+        "audio_features_by_ids": """
+            SELECT a.* FROM audio_features a
+            JOIN json_array_elements_text(CAST($ids AS json)) AS t(id) ON a.id = t.id
+        """
+        if POSTGRES
+        else """
+            SELECT a.* FROM audio_features a
+            JOIN json_each($ids) AS t ON a.id = t.value
+        """,
     }
 )
 
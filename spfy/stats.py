@@ -0,0 +1,123 @@
+import json
+import threading
+from collections import defaultdict
+
+from . import config, trace
+
+HIT = {"fresh", "stale", "hit", "coalesced", "negative"}
+
+
+# pylint: disable=too-many-instance-attributes
+class EndpointStats:
+    """Cache counters and timings of the calls to one endpoint template"""
+
+    __slots__ = (
+        "requests",
+        "hits",
+        "misses",
+        "not_modified",
+        "stale",
+        "coalesced",
+        "negative",
+        "errors",
+        "bytes",
+        "stored",
+        "hit_time",
+        "miss_time",
+    )
+
+    def __init__(self):
+        self.requests = self.hits = self.misses = self.not_modified = 0
+        self.stale = self.coalesced = self.negative = self.errors = 0
+        self.bytes = self.stored = 0
+        self.hit_time = self.miss_time = 0.0
+
+    def record(self, span):
+        self.requests += 1
+        self.bytes += span.bytes or 0
+        self.stored += span.stored or 0
+        if span.status and span.status >= 400 and span.cache != "negative":
+            self.errors += 1
+
+        if span.cache in HIT:
+            self.hits += 1
+            self.hit_time += span.duration or 0
+            self.not_modified += span.cache == "hit"
+            self.stale += span.cache == "stale"
+            self.coalesced += span.cache == "coalesced"
+            self.negative += span.cache == "negative"
+        elif span.cache == "miss":
+            self.misses += 1
+            self.miss_time += span.duration or 0
+
+    def to_dict(self):
+        cached = self.hits + self.misses
+        sent = self.not_modified + self.misses
+        return {
+            "requests": self.requests,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "stale": self.stale,
+            "coalesced": self.coalesced,
+            "negative": self.negative,
+            "errors": self.errors,
+            "bytes": self.bytes,
+            "stored": self.stored,
+            "hit_rate": self.hits / cached if cached else None,
+            "not_modified_rate": self.not_modified / sent if sent else None,
+            "avg_hit_ms": self.hit_time / self.hits * 1000 if self.hits else None,
+            "avg_miss_ms": self.miss_time / self.misses * 1000 if self.misses else None,
+        }
+
+
+class CacheStats:
+    """Trace sink that aggregates finished spans per endpoint template"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = defaultdict(EndpointStats)
+
+    def __call__(self, span):
+        if span.method != "GET":
+            return
+
+        with self.lock:
+            self.endpoints[span.endpoint].record(span)
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                endpoint: stats.to_dict()
+                for endpoint, stats in sorted(self.endpoints.items())
+            }
+
+    def reset(self):
+        with self.lock:
+            self.endpoints.clear()
+
+
+def query_stats(db):
+    """Pony's query counters of the current thread
+
+    ``cached`` counts the queries answered from the db_session cache
+    instead of the database.
+    """
+    local_stats = db.local_stats.values()
+    return {
+        "queries": len(local_stats),
+        "executed": sum(stat.db_count for stat in local_stats),
+        "cached": sum(stat.cache_count for stat in local_stats),
+        "time": sum(stat.sum_time or 0 for stat in local_stats),
+    }
+
+
+def export(stats, filename):
+    """Write the result of ``client.cache_stats()`` to ``filename`` as JSON"""
+    with open(filename, "w", encoding="utf-8") as f:
+        json.dump(stats, f, indent=2)
+
+
+cache_stats = CacheStats()
+if config.cache.stats.enabled:
+    trace.add_sink(cache_stats)
@@ -0,0 +1,167 @@
+import logging
+import re
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from functools import lru_cache
+from urllib.parse import urlparse
+
+from . import config, logger
+from .constants import API
+
+SINKS = []
+CURRENT_SPAN = ContextVar("spfy_span", default=None)
+
+ID_RE = re.compile(r"/[0-9A-Za-z]{22}(?=/|$)")
+ENDPOINT_TEMPLATES = [
+    (re.compile(re.sub(r"\\{\w+\\}", "[^/]+", re.escape(template))), template)
+    for template in sorted(
+        {e.value.split("?")[0] for e in API if e.value.startswith("/v1")},
+        key=len,
+        reverse=True,
+    )
+]
+
+
+@lru_cache(maxsize=4096)
+def endpoint_template(url):
+    """Map a request URL to its API path template, e.g. ``/v1/albums/{id}``"""
+    path = urlparse(url).path
+    for regex, template in ENDPOINT_TEMPLATES:
+        if regex.fullmatch(path):
+            return template
+    return ID_RE.sub("/{id}", path)
+
+
+class Span:
+    """Timing and outcome of one API call, including its retries"""
+
+    __slots__ = (
+        "method",
+        "url",
+        "status",
+        "bytes",
+        "stored",
+        "cache",
+        "retries",
+        "started_at",
+        "duration",
+        "_token",
+    )
+
+    def __init__(self, method, url):
+        self.method = method
+        self.url = url
+        self.status = None
+        self.bytes = None
+        self.stored = None
+        self.cache = None
+        self.retries = 0
+        self.duration = None
+        self.started_at = time.perf_counter()
+        self._token = None
+
+    @property
+    def endpoint(self):
+        return endpoint_template(self.url)
+
+    def to_dict(self):
+        return {
+            "method": self.method,
+            "endpoint": self.endpoint,
+            "status": self.status,
+            "bytes": self.bytes,
+            "stored": self.stored,
+            "cache": self.cache,
+            "retries": self.retries,
+            "duration": self.duration,
+        }
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.started_at
+        if self._token is not None:
+            CURRENT_SPAN.reset(self._token)
+            self._token = None
+
+        for sink in SINKS:
+            try:
+                sink(self)
+            except Exception as exc:
+                logger.warning("Trace sink %s failed: %s", sink, exc)
+
+    def __repr__(self):
+        return (
+            f"{self.method} {self.endpoint} {self.status} {self.bytes or 0}B"
+            f" cache={self.cache} retries={self.retries}"
+            f" {(self.duration or 0) * 1000:.1f}ms"
+        )
+
+
+def start_span(method, url):
+    """Start a span for the current context, or return None if no sink is enabled"""
+    if not SINKS:
+        return None
+
+    span = Span(method, url)
+    span._token = CURRENT_SPAN.set(span)
+    return span
+
+
+def annotate(**fields):
+    span = CURRENT_SPAN.get()
+    if span is not None:
+        for field, value in fields.items():
+            setattr(span, field, value)
+
+
+def record_retry(*_args):
+    span = CURRENT_SPAN.get()
+    if span is not None:
+        span.retries += 1
+
+
+def add_sink(sink):
+    if sink not in SINKS:
+        SINKS.append(sink)
+    return sink
+
+
+def remove_sink(sink):
+    if sink in SINKS:
+        SINKS.remove(sink)
+
+
+# pylint: disable=too-few-public-methods
+class LoggingSink:
+    """Logs every finished span as a single line"""
+
+    def __init__(self, level="INFO"):
+        self.level = logging.getLevelName(level) if isinstance(level, str) else level
+
+    def __call__(self, span):
+        logger.log(self.level, "%r", span)
+
+
+class MemorySink:
+    """Keeps the last ``maxlen`` finished spans"""
+
+    def __init__(self, maxlen=1000):
+        self.lock = threading.Lock()
+        self.spans = deque(maxlen=maxlen)
+
+    def __call__(self, span):
+        with self.lock:
+            self.spans.append(span)
+
+    def to_list(self):
+        with self.lock:
+            return [span.to_dict() for span in self.spans]
+
+    def clear(self):
+        with self.lock:
+            self.spans.clear()
+
+
+if config.trace.log:
+    add_sink(LoggingSink(config.trace.level or "INFO"))
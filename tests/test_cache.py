@@ -0,0 +1,344 @@
+import contextlib
+import json
+import time
+from uuid import uuid4
+
+import msgpack
+import pytest
+import requests
+from addict import Dict
+
+from spfy.cache import (
+    ApiCallCounter,
+    CachePolicy,
+    DeviceRegistry,
+    NegativeCache,
+    ResponseCache,
+    cache_policy,
+    usage,
+)
+from spfy.cache.compression import (
+    COMPRESSORS,
+    MARKER,
+    CompressionStats,
+    compress,
+    decompress,
+)
+from spfy.client import SpotifyClient
+from spfy.exceptions import SpotifyDeviceUnavailableException, SpotifyNotFoundException
+
+
+@pytest.fixture
+def response_cache(tmp_path):
+    return ResponseCache(
+        filename=tmp_path / "responses.sqlite",
+        max_size=10_000,
+        max_entries=3,
+        expire=100,
+        touch_interval=10,
+    )
+
+
+def test_response_cache(response_cache):
+    response_cache.set("key", '"etag"', {"name": "x"})
+    assert response_cache.get("key") == ('"etag"', {"name": "x"})
+    assert response_cache.get("missing") is None
+
+    response_cache.delete("key")
+    assert response_cache.get("key") is None
+
+
+def test_response_cache_evicts_least_recently_used(response_cache):
+    for i in range(5):
+        response_cache.set(f"key{i}", "etag", {"i": i})
+    response_cache.set("key4", "etag", {"i": 4})
+
+    stats = response_cache.stats()
+    assert stats["entries"] == 3
+    assert stats["evictions"] == 2
+    assert (stats["size"], stats["entries"]) == tuple(response_cache._count())
+    assert response_cache.get("key0") is None
+    assert response_cache.get("key4") is not None
+
+
+def test_response_cache_throttles_access_time(response_cache):
+    response_cache.set("key", "etag", {})
+    statements = []
+    response_cache.conn.set_trace_callback(statements.append)
+    response_cache.get("key")
+    assert not [s for s in statements if s.startswith("UPDATE")]
+
+    response_cache.conn.execute("UPDATE responses SET accessed_at = accessed_at - 20")
+    statements.clear()
+    response_cache.get("key")
+    assert [s for s in statements if s.startswith("UPDATE")]
+
+
+class FakeDatabase:
+    """Records the statements of a flush instead of running them"""
+
+    def __init__(self):
+        self.provider = self
+        self.statements = []
+        self.fail = False
+
+    def get_converter_by_py_type(self, _py_type):
+        return self
+
+    @staticmethod
+    def py2sql(value):
+        return value
+
+    # pylint: disable=redefined-builtin
+    def execute(self, sql, globals=None, locals=None):
+        if self.fail:
+            raise RuntimeError("database is down")
+        self.statements.append((sql, locals))
+
+
+@pytest.fixture
+def database(monkeypatch):
+    fake = FakeDatabase()
+    monkeypatch.setattr(usage, "db", fake)
+    monkeypatch.setattr(usage, "db_session", contextlib.nullcontext())
+    return fake
+
+
+def test_api_calls_are_flushed_in_one_update(database):
+    counter = ApiCallCounter(flush_interval=60)
+    alice, bob = uuid4(), uuid4()
+    for _ in range(3):
+        counter.increment(alice)
+    counter.increment(bob)
+
+    assert counter.flush() == 4
+    assert len(database.statements) == 1
+    _, params = database.statements[0]
+    assert sorted(v for k, v in params.items() if k.startswith("calls_")) == [1, 3]
+    assert counter.pending() == {}
+    assert counter.timer is None
+
+
+def test_api_calls_are_flushed_after_interval(database):
+    counter = ApiCallCounter(flush_interval=0.05)
+    counter.increment(uuid4())
+    counter.increment(uuid4())
+    assert not database.statements
+
+    time.sleep(0.2)
+    assert len(database.statements) == 1
+    assert counter.pending() == {}
+
+
+def test_api_calls_without_interval_are_written_right_away(database):
+    counter = ApiCallCounter(flush_interval=0)
+    counter.increment(uuid4())
+    assert len(database.statements) == 1
+    assert counter.pending() == {}
+
+
+def test_pending_api_calls(database):
+    counter = ApiCallCounter(flush_interval=60)
+    user_id = uuid4()
+    counter.increment(user_id)
+    counter.increment(str(user_id), calls=2)
+
+    assert counter.pending(user_id) == 3
+    assert counter.pending(str(user_id)) == 3
+    assert counter.pending(uuid4()) == 0
+    assert counter.pending() == {user_id: 3}
+    assert not database.statements
+
+
+def test_failed_flush_requeues_api_calls(database):
+    counter = ApiCallCounter(flush_interval=60)
+    user_id = uuid4()
+    counter.increment(user_id, calls=2)
+
+    database.fail = True
+    assert counter.flush() == 0
+    assert counter.pending(user_id) == 2
+
+    counter.increment(user_id)
+    database.fail = False
+    assert counter.flush() == 3
+    assert counter.pending(user_id) == 0
+
+
+DEVICES_URL = "https://api.spotify.com/v1/me/player/devices"
+MAC = {"id": "a" * 40, "name": "Mac", "is_active": True, "volume_percent": 20}
+SONOS = {"id": "b" * 40, "name": "Sonos", "is_active": False, "volume_percent": 50}
+
+
+class Response:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.content = json.dumps(body).encode() if body is not None else b""
+        self.text = self.content.decode()
+        self.headers = {}
+        self.url = DEVICES_URL
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(self.status_code)
+
+
+class Session:
+    """Answers requests with the queued responses, in order"""
+
+    authorized = True
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def request(self, method, url, **_kwargs):
+        self.requests.append((method, url))
+        return self.responses.pop(0)
+
+
+def devices_response(*devices):
+    return Response(200, {"devices": [dict(d) for d in devices]})
+
+
+@pytest.fixture
+def client(tmp_path):
+    client = SpotifyClient(
+        user_id=uuid4(),
+        response_cache=ResponseCache(filename=tmp_path / "responses.sqlite"),
+    )
+    client.session = Session()
+    return client
+
+
+def test_device_registry_expires():
+    registry = DeviceRegistry(ttl=0.05)
+    assert not registry.fresh
+
+    registry.update([Dict(MAC)])
+    assert registry.fresh
+    assert registry.get("Mac") is registry.get(MAC["id"])
+
+    time.sleep(0.06)
+    assert not registry.fresh
+
+
+def test_get_device_fetches_devices_on_miss(client):
+    client.session.responses.append(devices_response(MAC))
+    assert client.get_device("Mac").id == MAC["id"]
+    # The registry is fresh, so the device is not fetched again
+    assert client.get_device().name == "Mac"
+    assert client.session.requests == [("GET", DEVICES_URL)]
+
+    client.session.responses.append(devices_response(MAC, SONOS))
+    assert client.get_device("Sonos").id == SONOS["id"]
+    assert client.session.requests == [("GET", DEVICES_URL)] * 2
+
+
+def test_player_commands_update_registry(client):
+    client.device_registry.update([Dict(MAC), Dict(SONOS)])
+    client.session.responses.append(Response(204))
+    client.transfer_playback("Sonos")
+    assert client.get_device().name == "Sonos"
+
+    client.session.responses.append(Response(204))
+    client.volume(80, device="Sonos")
+    assert client.volume(device="Sonos") == 80
+    assert len(client.session.requests) == 2
+
+
+@pytest.mark.parametrize(
+    "response",
+    [
+        Response(404, {"error": {"status": 404, "message": "Device not found"}}),
+        Response(202),
+    ],
+)
+def test_device_errors_invalidate_registry(client, response):
+    client.device_registry.update([Dict(MAC)])
+    client.session.responses.append(response)
+    with pytest.raises((SpotifyNotFoundException, SpotifyDeviceUnavailableException)):
+        client.volume(50, device="Mac")
+    assert not client.device_registry.fresh
+
+
+def test_policy_state():
+    policy = CachePolicy("test", ttl=10, stale=20)
+    assert policy.state(5) == "fresh"
+    assert policy.state(15) == "stale"
+    assert policy.state(30) == "expired"
+    assert CachePolicy("test").state(0) == "expired"
+
+
+def test_policy_by_endpoint():
+    album = cache_policy("https://api.spotify.com/v1/albums/4aawyAB9vmqN3uQ7FjRGTy")
+    assert album.name == "album"
+    assert album.ttl > 0
+    other = "https://api.spotify.com/v1/albums/0sNOF9WDwhWunNAHPD3Baj"
+    assert cache_policy(other) is album
+    assert cache_policy("https://api.spotify.com/v1/me/tracks?limit=50") is not album
+
+
+def test_small_payloads_are_not_compressed():
+    data = msgpack.dumps({"name": "x"})
+    assert compress(data) == data
+    assert decompress(data) == data
+
+
+def test_compression_roundtrip():
+    data = msgpack.dumps({"items": [{"name": "track", "id": i} for i in range(2000)]})
+    stored = compress(data)
+    assert stored.startswith(MARKER)
+    assert len(stored) < len(data)
+    assert decompress(stored) == data
+
+
+@pytest.mark.parametrize("name", sorted(COMPRESSORS))
+def test_compressors(name):
+    compressor = COMPRESSORS[name]
+    data = b"spotify" * 1000
+    assert compressor.decompress(compressor.compress(data, None)) == data
+
+
+def test_unknown_codec():
+    with pytest.raises(ValueError):
+        decompress(MARKER + b"\xff" + b"data")
+
+
+def test_compression_stats():
+    stats = CompressionStats()
+    stats.record(100, 100)
+    stats.record(300, 100)
+    assert stats.to_dict() == {
+        "entries": 2,
+        "compressed": 1,
+        "bytes_in": 400,
+        "bytes_out": 200,
+        "ratio": 2.0,
+    }
+
+
+def test_negative_cache_expires():
+    cache = NegativeCache(ttl=0.05)
+    cache.add("key")
+    assert "key" in cache
+    time.sleep(0.06)
+    assert "key" not in cache
+    assert len(cache) == 0
+
+
+def test_negative_cache_drops_oldest():
+    cache = NegativeCache(ttl=60, max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.add(key)
+    assert "a" not in cache
+    assert "b" in cache and "c" in cache
+
+    cache.discard("b")
+    assert "b" not in cache
+
+
+def test_negative_policies():
+    album = cache_policy("https://api.spotify.com/v1/albums/4aawyAB9vmqN3uQ7FjRGTy")
+    assert album.negative
+    assert not cache_policy("https://api.spotify.com/v1/me/tracks").negative
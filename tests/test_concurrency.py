@@ -0,0 +1,158 @@
+import asyncio
+
+import pytest
+
+from spfy.asynch import LimitedAsCompletedError, limited_as_completed
+from spfy.concurrency import ConcurrencyController, get_concurrency_controller
+from spfy.exceptions import SpotifyRateLimitException
+
+
+def controller(**kwargs):
+    return ConcurrencyController(
+        **{"initial": 4, "minimum": 1, "maximum": 8, "cooldown": 0, **kwargs}
+    )
+
+
+def test_additive_increase():
+    c = controller()
+    # About one step per limit's worth of healthy responses
+    for _ in range(5):
+        c.record(0.1)
+    assert c.limit == 5
+    assert c.increases == 5
+
+
+def test_limit_is_capped():
+    c = controller(initial=8)
+    for _ in range(100):
+        c.record(0.1)
+    assert c.limit == 8
+
+
+def test_multiplicative_decrease():
+    c = controller(initial=8)
+    c.backoff()
+    assert c.limit == 4
+    c.backoff()
+    c.backoff()
+    c.backoff()
+    assert c.limit == 1
+    assert c.decreases == 4
+
+
+def test_cooldown():
+    c = controller(initial=8, cooldown=60)
+    c.backoff()
+    c.backoff()
+    assert c.limit == 4
+    assert c.decreases == 1
+
+
+def test_rising_latency_decreases():
+    c = controller(initial=8, smoothing=1)
+    c.record(0.1)
+    c.record(0.5)
+    assert c.limit == 4
+
+
+def test_is_overload():
+    assert ConcurrencyController.is_overload(SpotifyRateLimitException(status_code=429))
+    assert ConcurrencyController.is_overload(SpotifyRateLimitException(status_code=503))
+    assert not ConcurrencyController.is_overload(ValueError())
+
+
+def test_shared_by_key():
+    assert get_concurrency_controller("app") is get_concurrency_controller("app")
+
+
+def test_run_shares_slots():
+    c = controller()
+    in_flight = []
+
+    async def request(i):
+        in_flight.append(c.in_flight)
+        await asyncio.sleep(0.01)
+        return i
+
+    async def fan_out():
+        return await asyncio.gather(*(c.run(request(i)) for i in range(20)))
+
+    assert asyncio.run(fan_out()) == list(range(20))
+    assert max(in_flight) <= 8
+    assert c.in_flight == 0
+
+
+def test_run_backs_off_on_overload():
+    c = controller(initial=8)
+
+    async def request():
+        raise SpotifyRateLimitException(status_code=429)
+
+    with pytest.raises(SpotifyRateLimitException):
+        asyncio.run(c.run(request()))
+    assert c.limit == 4
+    assert c.in_flight == 0
+
+
+async def delayed(i, delay=0.01):
+    await asyncio.sleep(delay)
+    return i
+
+
+async def collect(*args, **kwargs):
+    return [result async for result in limited_as_completed(*args, **kwargs)]
+
+
+def test_limited_as_completed():
+    running = 0
+    peak = 0
+
+    async def request(i):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return i
+
+    results = asyncio.run(collect((request(i) for i in range(20)), 5))
+    assert sorted(results) == list(range(20))
+    assert peak == 5
+
+
+def test_limited_as_completed_ordered():
+    coros = (delayed(i, 0.03 if i % 3 == 0 else 0.01) for i in range(10))
+    assert asyncio.run(collect(coros, 4, ordered=True)) == list(range(10))
+
+
+def test_limited_as_completed_controller():
+    c = controller()
+    results = asyncio.run(collect((delayed(i) for i in range(10)), c))
+    assert sorted(results) == list(range(10))
+    assert c.in_flight == 0
+
+
+def test_limited_as_completed_ignore_exceptions():
+    async def fail():
+        raise ValueError("nope")
+
+    coros = [delayed(1), fail(), delayed(2)]
+    results = asyncio.run(collect(coros, 2, ignore_exceptions=(ValueError,)))
+    assert sorted(r for r in results if r is not None) == [1, 2]
+
+
+def test_limited_as_completed_error_cancels_pending():
+    async def fail():
+        raise ValueError("nope")
+
+    async def run():
+        coros = [fail(), delayed(1, 1), delayed(2, 1)]
+        with pytest.raises(LimitedAsCompletedError) as exc_info:
+            await collect(coros, 3)
+        await asyncio.sleep(0)
+        return exc_info.value
+
+    exc = asyncio.run(run())
+    assert isinstance(exc.original_exc, ValueError)
+    assert len(exc.remaining_futures) == 2
+    assert all(f.cancelled() for f in exc.remaining_futures)
@@ -0,0 +1,32 @@
+from spfy.models import Model, Playlist, SearchResult, Track, from_response
+
+TRACKS_URL = "https://api.spotify.com/v1/me/tracks"
+SEARCH_URL = "https://api.spotify.com/v1/search"
+
+
+def track(i):
+    return {"id": str(i), "name": f"track {i}", "type": "track"}
+
+
+def test_iterate_paging_model():
+    page = from_response(
+        TRACKS_URL, {"items": [{"track": track(i)} for i in range(3)], "total": 3}
+    )
+    assert [item.track.id for item in page] == ["0", "1", "2"]
+    assert isinstance(page[1].track, Track)
+    assert page[-1].track.name == "track 2"
+
+
+def test_iterate_nested_paging_model():
+    results = {"tracks": {"items": [track(i) for i in range(2)], "total": 2}}
+    search = from_response(SEARCH_URL, results)
+    assert isinstance(search, SearchResult)
+    assert [t.id for t in search] == ["0", "1"]
+    assert isinstance(search[0], Track)
+
+
+def test_iterate_model_without_items():
+    playlist = Playlist({"id": "x", "name": "y"})
+    assert list(playlist) == ["id", "name"]
+    assert dict(playlist.items()) == {"id": "x", "name": "y"}
+    assert list(Model()) == []
@@ -0,0 +1,82 @@
+import asyncio
+import time
+
+import pytest
+import requests
+
+from spfy.client import SpotifyClient
+from spfy.exceptions import SpotifyRateLimitException
+from spfy.ratelimit import RateLimiter, backoff_delay, get_rate_limiter
+
+
+def test_pacing_is_off_by_default():
+    limiter = RateLimiter(jitter=0)
+    assert limiter.rate == 0
+    assert all(limiter.reserve() == 0 for _ in range(1000))
+
+
+def test_burst_then_paced():
+    limiter = RateLimiter(rate=10, burst=5, jitter=0)
+    delays = [limiter.reserve() for _ in range(7)]
+    assert delays[:5] == [0] * 5
+    assert 0.05 < delays[5] <= 0.1
+    assert 0.15 < delays[6] <= 0.2
+
+
+def test_tokens_refill():
+    limiter = RateLimiter(rate=100, burst=1, jitter=0)
+    assert limiter.reserve() == 0
+    time.sleep(0.02)
+    assert limiter.reserve() == 0
+
+
+def test_block_holds_back_every_caller():
+    limiter = RateLimiter(jitter=0.01)
+    limiter.block(0.2)
+    assert 0.15 < limiter.reserve() <= 0.21
+    assert 0.15 < limiter.blocked_for() <= 0.21
+
+    # A shorter Retry-After doesn't shorten the deadline
+    limiter.block(0.01)
+    assert limiter.blocked_for() > 0.15
+
+
+def test_wait_until_deadline():
+    limiter = RateLimiter(jitter=0)
+    limiter.block(0.05)
+    started_at = time.monotonic()
+    asyncio.run(limiter.wait())
+    assert time.monotonic() - started_at >= 0.05
+    assert limiter.blocked_for() == 0
+
+
+def test_backoff_delay_is_capped():
+    assert all(0 <= backoff_delay(attempt) <= pow(2, attempt) for attempt in range(4))
+    assert all(backoff_delay(20, maximum=3) <= 3 for _ in range(100))
+
+
+class Response:
+    status_code = 429
+    url = "https://api.spotify.com/v1/me"
+    text = ""
+
+    def __init__(self, headers):
+        self.headers = headers
+
+    def raise_for_status(self):
+        raise requests.HTTPError(self.status_code)
+
+
+@pytest.mark.parametrize(
+    "headers, retry_after",
+    [({"Retry-After": "3"}, 3), ({"Retry-After": "0"}, 0), ({}, None)],
+)
+def test_retry_after_header(headers, retry_after):
+    with pytest.raises(SpotifyRateLimitException) as exc_info:
+        SpotifyClient._check_response(Response(headers))
+    assert exc_info.value.retry_after == retry_after
+
+
+def test_shared_by_key():
+    assert get_rate_limiter("app") is get_rate_limiter("app")
+    assert get_rate_limiter("app") is not get_rate_limiter("other app")
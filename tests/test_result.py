@@ -0,0 +1,132 @@
+import asyncio
+import threading
+
+import pytest
+
+from spfy.asynch.result import (
+    SpotifyCursorIterator,
+    SpotifyResult as AsyncSpotifyResult,
+)
+from spfy.result import SpotifyResult
+
+
+URL = "https://api.spotify.com/v1/me/following"
+
+
+def cursor_page(after, total=7, limit=2):
+    """A page of followed artists, paginated by cursor like the real endpoint"""
+    end = min(total, after + limit)
+    next_url = f"{URL}?type=artist&after={end}&limit={limit}" if end < total else None
+    return {
+        "artists": {
+            "href": f"{URL}?type=artist&after={after}&limit={limit}",
+            "items": [{"id": str(i), "type": "artist"} for i in range(after, end)],
+            "limit": limit,
+            "next": next_url,
+            "cursors": {"after": str(end)},
+        }
+    }
+
+
+def after(url):
+    return int(url.split("after=")[1].split("&")[0])
+
+
+class Client:
+    def __init__(self, fail_at=None):
+        self.requested = []
+        self.fail_at = fail_at
+        self.lock = threading.Lock()
+
+    def page(self, url):
+        with self.lock:
+            self.requested.append(url)
+        if after(url) == self.fail_at:
+            raise ValueError(url)
+        return cursor_page(after(url))
+
+
+class AsyncClient(Client):
+    async def _get(self, url, raw=False, **_params):
+        await asyncio.sleep(0.001)
+        page = self.page(url)
+        return page if raw else AsyncSpotifyResult(page, _client=self)
+
+
+def test_async_cursor_paging():
+    page = cursor_page(0)
+    assert AsyncSpotifyResult.cursor_paging(page) is page["artists"]
+    assert AsyncSpotifyResult.cursor_paging({"items": [], "total": 0}) is None
+
+
+def test_async_cursor_iterator():
+    client = AsyncClient()
+    result = AsyncSpotifyResult(cursor_page(0), _client=client)
+
+    async def collect():
+        iterator = result.iterall(limit=2)
+        assert isinstance(iterator, SpotifyCursorIterator)
+        return [artist.id async for artist in iterator]
+
+    assert asyncio.run(collect()) == [str(i) for i in range(7)]
+    assert len(client.requested) == 3
+
+
+def test_async_cursor_iterator_lookahead():
+    client = AsyncClient()
+    result = AsyncSpotifyResult(cursor_page(0), _client=client)
+
+    async def first_item():
+        async for artist in result.iterall(max_pages=1):
+            await asyncio.sleep(0.05)
+            return artist.id
+        return None
+
+    assert asyncio.run(first_item()) == "0"
+    # One page in the queue and one waiting to be put in it
+    assert len(client.requested) <= 2
+
+
+def test_async_cursor_iterator_ignore_exceptions():
+    result = AsyncSpotifyResult(cursor_page(0), _client=AsyncClient(fail_at=4))
+
+    async def collect(**kwargs):
+        return [artist.id async for artist in result.iterall(**kwargs)]
+
+    assert asyncio.run(collect(ignore_exceptions=True)) == ["0", "1", "2", "3"]
+    with pytest.raises(ValueError):
+        asyncio.run(collect())
+
+
+class SyncClient(Client):
+    def _get(self, url, raw=False, **_params):
+        page = self.page(url)
+        return page if raw else SpotifyResult(page, _client=self)
+
+
+def test_cursor_paging():
+    page = cursor_page(0)
+    assert SpotifyResult.cursor_paging(page) is page["artists"]
+    assert SpotifyResult.next_url(page) == page["artists"]["next"]
+    assert SpotifyResult.cursor_paging({"items": [], "total": 0}) is None
+
+
+def test_iterall_follows_cursors():
+    client = SyncClient()
+    result = SpotifyResult(cursor_page(0), _client=client)
+    assert [a.id for a in result.iterall()] == [str(i) for i in range(7)]
+    assert len(client.requested) == 3
+
+
+def test_iterall_raw_cursors():
+    result = SpotifyResult(cursor_page(0), _client=SyncClient())
+    items = list(result.iterall(raw=True))
+    assert items == [{"id": str(i), "type": "artist"} for i in range(7)]
+
+
+def test_iterall_raises_page_error():
+    result = SpotifyResult(cursor_page(0), _client=SyncClient(fail_at=4))
+    items = result.iterall()
+    assert [next(items).id for _ in range(4)] == ["0", "1", "2", "3"]
+    with pytest.raises(ValueError):
+        next(items)